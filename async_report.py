@@ -0,0 +1,257 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+import form
+import report
+import report_collection
+
+MAX_CONCURRENT_REQUESTS = 16  # Maximum number of API requests in flight for all async callers together
+
+# The SDK client is synchronous, requests run on this pool which also bounds their concurrency
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix='forms13f-async')
+
+
+def set_max_concurrent_requests(max_requests):
+    """
+    Change the maximum number of API requests in flight for all async callers together.
+
+    Requests already submitted complete on the previous pool.
+
+    Args:
+        max_requests (int): The maximum number of concurrent API requests.
+    """
+    global _executor
+    previous_executor = _executor
+    _executor = ThreadPoolExecutor(max_workers=max_requests, thread_name_prefix='forms13f-async')
+    previous_executor.shutdown(wait=False)
+
+
+async def _run(function, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(function, *args, **kwargs))
+
+
+async def get_form_headers(cik, from_date, to_date):
+    """
+    Retrieve the headers of all forms filed by a CIK for a range of periods of report.
+
+    See form.get_form_headers().
+
+    Args:
+        cik (str): The Central Index Key (CIK) of the filer.
+        from_date (str): The first period of report date in the format 'YYYY-MM-DD'.
+        to_date (str): The last period of report date in the format 'YYYY-MM-DD'.
+
+    Returns:
+        list: A list of forms13f.ApiV1Form headers in the order returned by the API.
+    """
+    return await _run(form.get_form_headers, cik, from_date, to_date)
+
+
+async def fetch_holdings(cik, accession_number, table_entry_total=None):
+    """
+    Retrieve all raw holdings rows of a form, requesting all of its pages concurrently.
+
+    See form.fetch_holdings().
+
+    Args:
+        cik (str): The Central Index Key (CIK) of the filer.
+        accession_number (str): The accession number of the form.
+        table_entry_total (int): The number of entries reported in the form header, or None if unknown.
+
+    Returns:
+        list: The ApiV1FormEntry rows of the form in the order returned by the API.
+    """
+    if form.filing_cache is not None:
+        cached_holdings = await _run(form.filing_cache.get_holdings, cik, accession_number)
+        if cached_holdings is not None:
+            return cached_holdings
+
+    all_holdings = []
+    offset = 0
+
+    if table_entry_total:
+        offsets = list(range(0, table_entry_total, form.PAGE_LIMIT))
+        pages = await asyncio.gather(*[
+            _run(form._get_holdings_page, cik, accession_number, page_offset) for page_offset in offsets
+        ])
+
+        for page in pages:
+            all_holdings.extend(page)
+        offset = offsets[-1] + form.PAGE_LIMIT
+        last_page = pages[-1]
+    else:
+        last_page = None
+
+    # Walk the remaining pages, if any, until a short page is returned
+    while last_page is None or len(last_page) == form.PAGE_LIMIT:
+        last_page = await _run(form._get_holdings_page, cik, accession_number, offset)
+        all_holdings.extend(last_page)
+        offset += form.PAGE_LIMIT
+
+    if form.filing_cache is not None:
+        await _run(form.filing_cache.put_holdings, cik, accession_number, all_holdings)
+
+    return all_holdings
+
+
+async def get_form(header):
+    """
+    Create the Form object of a form header, fetching its holdings concurrently.
+
+    Args:
+        header (forms13f.ApiV1Form): The header of the form.
+
+    Returns:
+        form.Form: The Form object with its holdings.
+    """
+    holdings = await fetch_holdings(header.cik, header.accession_number, header.table_entry_total)
+
+    return form.Form(header=header, cik=header.cik, accession_number=header.accession_number, holdings=holdings)
+
+
+async def get_forms_for_range(cik, from_date, to_date):
+    """
+    Retrieve the Form objects of a CIK for every period of report in a date range.
+
+    See form.get_forms_for_range(). The holdings of all forms are requested concurrently.
+
+    Args:
+        cik (str): The Central Index Key (CIK) of the filer.
+        from_date (str): The first period of report date in the format 'YYYY-MM-DD'.
+        to_date (str): The last period of report date in the format 'YYYY-MM-DD'.
+
+    Returns:
+        dict: A map with the period of report in the format 'YYYY-MM-DD' as key and the list of its Form objects
+        sorted by filed_as_of_date in ascending order as value.
+    """
+    headers = await get_form_headers(cik, from_date, to_date)
+    sorted_headers = sorted(headers, key=lambda header: header.filed_as_of_date)
+    form_objects = await asyncio.gather(*[get_form(header) for header in sorted_headers])
+
+    return form.group_forms_by_period(form_objects)
+
+
+async def get_forms_for_period(cik, period_of_report):
+    """
+    Retrieve and return a list of Form objects for a given CIK and period of report.
+
+    Args:
+        cik (str): The Central Index Key (CIK) of the filer.
+        period_of_report (str): The period of report date in the format 'YYYY-MM-DD'.
+
+    Returns:
+        list: A list of Form objects sorted by their filed_as_of_date in ascending order.
+    """
+    forms_by_period = await get_forms_for_range(cik, period_of_report, period_of_report)
+
+    return forms_by_period.get(period_of_report, [])
+
+
+class AsyncQuarterReport(report.QuarterReport):
+    """
+    A QuarterReport whose forms are retrieved with asyncio.
+
+    The constructor does not fetch anything, use the create() coroutine or await fetch():
+
+        quarter_report = await AsyncQuarterReport.create("2023-Q3", "0001067983")
+
+    Methods:
+        create(quarter, cik):
+            Coroutine returning a fetched AsyncQuarterReport.
+
+        fetch():
+            Coroutine retrieving and consolidating the forms of the quarter.
+    """
+
+    def __init__(self, quarter, cik):
+        super().__init__(quarter, cik, forms=[])
+
+    @classmethod
+    async def create(cls, quarter, cik):
+        quarter_report = cls(quarter, cik)
+        await quarter_report.fetch()
+        return quarter_report
+
+    async def fetch(self):
+        period_of_report = report.quarter_to_period_of_report(self.quarter)
+        forms = await get_forms_for_period(self.cik, period_of_report)
+        self._get_quarter_report(forms)
+
+
+class AsyncQuarterlyReportsCollection(report_collection.QuarterlyReportsCollection):
+    """
+    A QuarterlyReportsCollection whose forms are retrieved with asyncio.
+
+    The constructor does not fetch anything, use the create() coroutine or await fetch(). Several collections
+    can be built concurrently, their requests share the MAX_CONCURRENT_REQUESTS limit:
+
+        collections = await asyncio.gather(*[
+            AsyncQuarterlyReportsCollection.create(cik, 2020, 2024) for cik in ciks
+        ])
+
+    Methods:
+        create(cik, from_year, to_year):
+            Coroutine returning a fetched AsyncQuarterlyReportsCollection.
+
+        fetch():
+            Coroutine retrieving the forms of all quarters and populating the reports map.
+    """
+
+    def __init__(self, cik, from_year, to_year):
+        self._init_state(cik, from_year, to_year)
+        self._generate_quarters()
+
+    @classmethod
+    async def create(cls, cik, from_year, to_year):
+        collection = cls(cik, from_year, to_year)
+        await collection.fetch()
+        return collection
+
+    async def fetch(self):
+        self.last_sync = date.today()
+        if not self.quarters:
+            return
+
+        from_date = report.quarter_to_period_of_report(self.quarters[0])
+        to_date = report.quarter_to_period_of_report(self.quarters[-1])
+        forms_by_period = await get_forms_for_range(self.cik, from_date, to_date)
+        self._add_reports(forms_by_period)
+
+
+def run(coroutine):
+    """
+    Run a coroutine to completion and return its result, also from inside a running event loop.
+
+    In a Jupyter notebook the coroutines of this module can simply be awaited. This helper is for synchronous
+    code: without a running event loop it uses asyncio.run(), otherwise it runs the coroutine on a new event loop
+    in a separate thread and blocks until it completes.
+
+    Args:
+        coroutine: The coroutine to run.
+
+    Returns:
+        The result of the coroutine.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    result = {}
+
+    def run_in_thread():
+        try:
+            result['value'] = asyncio.run(coroutine)
+        except BaseException as error:
+            result['error'] = error
+
+    thread = threading.Thread(target=run_in_thread)
+    thread.start()
+    thread.join()
+
+    if 'error' in result:
+        raise result['error']
+    return result['value']
@@ -0,0 +1,134 @@
+"""
+Offline benchmarks of the main entry points, run against the local stub_server.StubServer.
+
+For every entry point and synthetic filer size the wall time, the number of API requests (and 429 responses)
+and the peak memory allocated by Python are reported. Peak memory is measured with tracemalloc in a second,
+separate run so that tracing does not distort the wall time.
+
+Usage:
+    python benchmark.py --latency 0.02 --rate-429 0.01 --filer 0000010000:10000 --json results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+
+import form
+import report
+import report_collection
+import stub_server
+
+ENTRY_POINTS = ['Form', 'QuarterReport', 'consolidate_holdings', 'QuarterlyReportsCollection', 'display_reports']
+
+
+class Benchmark:
+    """
+    A class to represent a benchmark run of the entry points against a stub server.
+
+    Attributes:
+        server (stub_server.StubServer): The running stub server.
+        from_year (int): The first year of the collections built.
+        to_year (int): The last year of the collections built.
+        results (list): A list of dicts with the entry_point, cik, holdings, seconds, requests, throttled and
+            peak_mb of each measurement.
+
+    Methods:
+        __init__(server, from_year, to_year):
+            Initializes the Benchmark object.
+
+        run(entry_points):
+            Measures the given entry points for every filer of the server.
+    """
+
+    def __init__(self, server, from_year, to_year):
+        self.server = server
+        self.from_year = from_year
+        self.to_year = to_year
+        self.results = []
+
+    def run(self, entry_points=ENTRY_POINTS):
+        for cik, filer in sorted(self.server.filers.items(), key=lambda item: item[1].holdings_count):
+            # Forms of the second quarter of to_year, the original 13F-HR and a 'NEW HOLDINGS' amendment
+            quarter = f"{self.to_year}-Q2"
+            period_of_report = report.quarter_to_period_of_report(quarter)
+            header = max(form.get_form_headers(cik, period_of_report, period_of_report),
+                         key=lambda header: header.table_entry_total)
+            forms = form.get_forms_for_period(cik, period_of_report)
+            collection = report_collection.QuarterlyReportsCollection(cik, self.from_year, self.to_year)
+
+            steps = {
+                'Form': lambda: form.Form(header, cik, header.accession_number),
+                'QuarterReport': lambda: report.QuarterReport(quarter, cik),
+                'consolidate_holdings': lambda: form.consolidate_holdings(forms),
+                'QuarterlyReportsCollection': lambda: report_collection.QuarterlyReportsCollection(
+                    cik, self.from_year, self.to_year),
+                'display_reports': lambda: [collection.display_reports(by, output="as_html")
+                                            for by in ["value", "shares", "fraction"]],
+            }
+            for entry_point in entry_points:
+                self.results.append(dict(entry_point=entry_point, cik=cik, holdings=filer.holdings_count,
+                                         **self._measure(steps[entry_point])))
+
+        return self.results
+
+    def _measure(self, step):
+        # First run: wall time and requests, with the header lists requested again as in a new process
+        form.clear_memo()
+        self.server.reset_counts()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            step()
+            seconds = time.perf_counter() - start
+        requests = sum(self.server.request_counts.values())
+        throttled = sum(self.server.throttled_counts.values())
+
+        # Second run: peak memory
+        form.clear_memo()
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            step()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return dict(seconds=round(seconds, 4), requests=requests, throttled=throttled,
+                    peak_mb=round(peak / (1024 * 1024), 2))
+
+
+def print_results(results):
+    columns = ['entry_point', 'cik', 'holdings', 'seconds', 'requests', 'throttled', 'peak_mb']
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print('  '.join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the entry points against a local stub server.")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="requests per second of the client rate limiter, default unlimited")
+    parser.add_argument('--filer', type=stub_server.parse_filer, action='append',
+                        help="CIK:HOLDINGS of a synthetic filer, can be repeated")
+    parser.add_argument('--from-year', type=int, default=2023)
+    parser.add_argument('--to-year', type=int, default=2024)
+    parser.add_argument('--entry-point', choices=ENTRY_POINTS, action='append',
+                        help="entry point to measure, can be repeated, default all")
+    parser.add_argument('--json', help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    with stub_server.StubServer(filers=dict(args.filer) if args.filer else None, latency=args.latency,
+                                rate_429=args.rate_429, from_year=args.from_year,
+                                to_year=args.to_year) as server:
+        form.disable_cache()
+        form.configure(host=server.url, rate=args.rate)
+        benchmark = Benchmark(server, args.from_year, args.to_year)
+        results = benchmark.run(args.entry_point or ENTRY_POINTS)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
@@ -0,0 +1,218 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import forms13f
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'forms13f')
+HEADERS_TTL = 24 * 60 * 60  # Seconds a cached list of form headers stays valid
+MAX_SIZE = 1024 * 1024 * 1024  # Bytes of compressed data kept before the least recently used entries are evicted
+
+
+class FilingCache:
+    """
+    A class to represent a persistent on-disk cache of forms 13F, stored in a SQLite database.
+
+    A filed form never changes, amendments are filed under new accession numbers, so the holdings of a form are
+    cached forever under (cik, accession_number). Lists of form headers do change when amendments or new reports
+    are filed, so they are only served for headers_ttl seconds. When the compressed data exceeds max_size bytes,
+    the least recently used entries are evicted.
+
+    Attributes:
+        directory (str): The directory holding the cache database.
+        headers_ttl (int): Number of seconds a cached list of form headers stays valid.
+        max_size (int): Maximum number of bytes of compressed data kept in the cache.
+
+    Methods:
+        __init__(directory, headers_ttl, max_size):
+            Initializes the FilingCache object and creates the database if needed.
+
+        get_holdings(cik, accession_number):
+            Returns the cached holdings rows of a form or None.
+
+        put_holdings(cik, accession_number, holdings):
+            Stores the holdings rows of a form.
+
+        get_headers(cik, from_date, to_date):
+            Returns the cached form headers of a period range or None if missing or expired.
+
+        put_headers(cik, from_date, to_date, headers):
+            Stores the form headers of a period range.
+
+        size():
+            Returns the number of bytes of compressed data in the cache.
+
+        clear():
+            Removes all entries from the cache.
+    """
+
+    def __init__(self, directory=None, headers_ttl=HEADERS_TTL, max_size=MAX_SIZE):
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.headers_ttl = headers_ttl
+        self.max_size = max_size
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(self.directory, 'forms13f.sqlite'),
+                                           timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS holdings (
+                    cik TEXT NOT NULL,
+                    accession_number TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (cik, accession_number)
+                )""")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS headers (
+                    cik TEXT NOT NULL,
+                    from_date TEXT NOT NULL,
+                    to_date TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (cik, from_date, to_date)
+                )""")
+
+    def get_holdings(self, cik, accession_number):
+        """
+        Return the cached holdings rows of a form.
+
+        Args:
+            cik (str): The Central Index Key (CIK) of the filer.
+            accession_number (str): The accession number of the form.
+
+        Returns:
+            list: The forms13f.ApiV1FormEntry rows of the form, or None if the form is not cached.
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT data FROM holdings WHERE cik = ? AND accession_number = ?", (cik, accession_number)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE holdings SET last_access = ? WHERE cik = ? AND accession_number = ?",
+                (time.time(), cik, accession_number)
+            )
+
+        return [forms13f.ApiV1FormEntry.from_dict(entry) for entry in _decode(row[0])]
+
+    def put_holdings(self, cik, accession_number, holdings):
+        """
+        Store the holdings rows of a form.
+
+        Args:
+            cik (str): The Central Index Key (CIK) of the filer.
+            accession_number (str): The accession number of the form.
+            holdings (list): The forms13f.ApiV1FormEntry rows of the form.
+        """
+        data = _encode([holding.to_dict() for holding in holdings])
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO holdings VALUES (?, ?, ?, ?, ?)",
+                (cik, accession_number, data, len(data), time.time())
+            )
+            self._evict()
+
+    def get_headers(self, cik, from_date, to_date):
+        """
+        Return the cached form headers of a CIK for a range of periods of report.
+
+        Args:
+            cik (str): The Central Index Key (CIK) of the filer.
+            from_date (str): The first period of report date in the format 'YYYY-MM-DD'.
+            to_date (str): The last period of report date in the format 'YYYY-MM-DD'.
+
+        Returns:
+            list: The forms13f.ApiV1Form headers, or None if they are not cached or older than headers_ttl.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT data, fetched_at FROM headers WHERE cik = ? AND from_date = ? AND to_date = ?",
+                (cik, str(from_date), str(to_date))
+            ).fetchone()
+            if row is None or now - row[1] > self.headers_ttl:
+                return None
+            self._connection.execute(
+                "UPDATE headers SET last_access = ? WHERE cik = ? AND from_date = ? AND to_date = ?",
+                (now, cik, str(from_date), str(to_date))
+            )
+
+        return [forms13f.ApiV1Form.from_dict(header) for header in _decode(row[0])]
+
+    def put_headers(self, cik, from_date, to_date, headers):
+        """
+        Store the form headers of a CIK for a range of periods of report.
+
+        Args:
+            cik (str): The Central Index Key (CIK) of the filer.
+            from_date (str): The first period of report date in the format 'YYYY-MM-DD'.
+            to_date (str): The last period of report date in the format 'YYYY-MM-DD'.
+            headers (list): The forms13f.ApiV1Form headers.
+        """
+        data = _encode([header.to_dict() for header in headers])
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cik, str(from_date), str(to_date), data, len(data), now, now)
+            )
+            self._evict()
+
+    def size(self):
+        """
+        Return the number of bytes of compressed data in the cache.
+        """
+        with self._lock:
+            return self._size()
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM holdings")
+            self._connection.execute("DELETE FROM headers")
+
+    def _size(self):
+        return self._connection.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM holdings) + (SELECT COALESCE(SUM(size), 0) FROM headers)"
+        ).fetchone()[0]
+
+    def _evict(self):
+        # Remove the least recently used entries of both tables until the cache fits in max_size
+        excess = self._size() - self.max_size
+        if excess <= 0:
+            return
+
+        entries = self._connection.execute("""
+            SELECT 'holdings', rowid, size, last_access FROM holdings
+            UNION ALL
+            SELECT 'headers', rowid, size, last_access FROM headers
+            ORDER BY last_access
+        """)
+        evicted = []
+        for table, rowid, size, _ in entries:
+            if excess <= 0:
+                break
+            evicted.append((table, rowid))
+            excess -= size
+
+        for table, rowid in evicted:
+            self._connection.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+
+
+def _encode(rows):
+    return zlib.compress(json.dumps(rows, default=str).encode('utf-8'))
+
+
+def _decode(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
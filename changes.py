@@ -0,0 +1,133 @@
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+CHANGE_TYPES = ['new', 'added', 'unchanged', 'trimmed', 'exited']
+CHANGE_COLUMNS = [
+    'report_quarter',
+    'previous_quarter',
+    'cusip',
+    'name_of_issuer',
+    'ticker',
+    'change',
+    'previous_shares',
+    'shares',
+    'shares_change',
+    'previous_value',
+    'value',
+    'value_change'
+]
+
+
+def position_changes(holdings_table, quarters=None):
+    """
+    Compute the quarter over quarter changes of every position of a long-format holdings table.
+
+    Positions are keyed on CUSIP (and CIK when the table has a cik column), so renamed issuers and missing tickers
+    do not split or merge positions. Every quarter is compared with the previous one in quarters in a single
+    vectorized pass: each (position, quarter) pair is encoded as an integer and matched with the pair of the
+    previous quarter by a binary search.
+
+    A position is 'new' when it is only held in the quarter, 'exited' when it is only held in the previous
+    quarter, and 'added', 'trimmed' or 'unchanged' depending on the change of its number of shares.
+
+    Args:
+        holdings_table (pandas.DataFrame): A long-format holdings table with report_quarter, cusip, name_of_issuer,
+            ticker, ssh_prnamt and value columns, e.g. from QuarterlyReportsCollection.get_holdings_table().
+        quarters (list): The quarters to compare in the format 'YYYY-Q<1-4>', in ascending order. Default is the
+            quarters present in the table.
+
+    Returns:
+        pandas.DataFrame: One row per position and pair of adjacent quarters where it is held in either quarter,
+        with the CHANGE_COLUMNS columns (preceded by cik if present), sorted by cik, report_quarter and cusip.
+        The frame is empty when fewer than two quarters are compared.
+
+    Examples:
+        >>> one_quarter = pd.DataFrame({'report_quarter': ['2024-Q1'], 'cusip': ['037833100'],
+        ...                             'name_of_issuer': ['APPLE INC'], 'ticker': ['AAPL'], 'ssh_prnamt': [100],
+        ...                             'value': [17000]})
+        >>> position_changes(one_quarter).empty
+        True
+        >>> len(position_changes(one_quarter, quarters=['2023-Q4', '2024-Q1']))
+        1
+    """
+    keys = ['cik', 'cusip'] if 'cik' in holdings_table.columns else ['cusip']
+    if quarters is None:
+        quarters = sorted(holdings_table['report_quarter'].unique())
+    quarters = pd.Series(quarters).array
+    quarter_count = len(quarters)
+
+    quarter_index = pd.Index(quarters).get_indexer(holdings_table['report_quarter'])
+    table = holdings_table[quarter_index >= 0]
+    quarter_index = quarter_index[quarter_index >= 0]
+    if table.empty or quarter_count < 2:
+        # No pair of adjacent quarters to compare
+        return pd.DataFrame(columns=keys[:-1] + CHANGE_COLUMNS)
+
+    # Integer code of each position, in (cik, cusip) order, and of each (position, quarter) pair
+    position = table.groupby(keys, sort=True, dropna=False).ngroup().to_numpy()
+    position_keys = table[keys].iloc[np.unique(position, return_index=True)[1]]
+    pair = position * quarter_count + quarter_index
+
+    # One entry per (position, quarter) in ascending order, duplicated CUSIPs are summed
+    rows = np.argsort(pair, kind='stable')
+    starts = np.flatnonzero(np.concatenate([[True], pair[rows][1:] != pair[rows][:-1]]))
+    pairs = pair[rows][starts]
+    first_row = rows[starts]
+    shares = np.add.reduceat(table['ssh_prnamt'].to_numpy(dtype='int64')[rows], starts)
+    value = np.add.reduceat(table['value'].to_numpy(dtype='int64')[rows], starts)
+
+    # Every pair where the position is held in the quarter or in the previous quarter, except the first quarter
+    held = pairs[pairs % quarter_count >= 1]
+    held_next = pairs[pairs % quarter_count < quarter_count - 1] + 1
+    compared = np.sort(np.concatenate([held, held_next]))
+    if compared.size == 0:
+        return pd.DataFrame(columns=keys[:-1] + CHANGE_COLUMNS)
+    compared = compared[np.concatenate([[True], compared[1:] != compared[:-1]])]
+    compared_position = compared // quarter_count
+    compared_quarter = compared % quarter_count
+
+    # Sort by cik, report_quarter and cusip, positions are already in (cik, cusip) order
+    fund = pd.factorize(position_keys['cik'])[0] if 'cik' in keys else np.zeros(len(position_keys), dtype='int64')
+    order = np.lexsort((compared_position, compared_quarter, fund[compared_position]))
+    compared, compared_position, compared_quarter = compared[order], compared_position[order], compared_quarter[order]
+
+    current = np.searchsorted(pairs, compared)
+    is_current = current < len(pairs)
+    is_current[is_current] = pairs[current[is_current]] == compared[is_current]
+    previous = np.searchsorted(pairs, compared - 1)
+    is_previous = previous < len(pairs)
+    is_previous[is_previous] = pairs[previous[is_previous]] == compared[is_previous] - 1
+
+    current_shares = np.where(is_current, shares[np.minimum(current, len(pairs) - 1)], 0)
+    previous_shares = np.where(is_previous, shares[np.minimum(previous, len(pairs) - 1)], 0)
+    current_value = np.where(is_current, value[np.minimum(current, len(pairs) - 1)], 0)
+    previous_value = np.where(is_previous, value[np.minimum(previous, len(pairs) - 1)], 0)
+
+    # Issuer name and ticker from the quarter if held, otherwise from the previous quarter
+    name_row = first_row[np.where(is_current, np.minimum(current, len(pairs) - 1), previous)]
+
+    # Columns are taken from their arrays, without a round trip through Python objects
+    changes = pd.DataFrame({key: position_keys[key].array.take(compared_position) for key in keys})
+    changes['report_quarter'] = quarters.take(compared_quarter)
+    changes['previous_quarter'] = quarters.take(compared_quarter - 1)
+    changes['name_of_issuer'] = table['name_of_issuer'].array.take(name_row)
+    changes['ticker'] = table['ticker'].array.take(name_row)
+    changes['change'] = pd.Categorical.from_codes(
+        np.select(
+            [~is_previous, ~is_current, current_shares > previous_shares, current_shares < previous_shares],
+            [CHANGE_TYPES.index('new'), CHANGE_TYPES.index('exited'), CHANGE_TYPES.index('added'),
+             CHANGE_TYPES.index('trimmed')],
+            CHANGE_TYPES.index('unchanged')
+        ),
+        categories=CHANGE_TYPES
+    )
+    changes['previous_shares'] = previous_shares
+    changes['shares'] = current_shares
+    changes['shares_change'] = current_shares - previous_shares
+    changes['previous_value'] = previous_value
+    changes['value'] = current_value
+    changes['value_change'] = current_value - previous_value
+
+    return changes[keys[:-1] + CHANGE_COLUMNS]
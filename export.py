@@ -0,0 +1,158 @@
+"""
+Headless export of the quarterly reports of a list of funds to CSV or Parquet files, e.g. for a nightly cron job.
+
+The QuarterlyReportsCollection of every fund is built on a pool of workers and written to the directory as:
+
+    <directory>/<cik>_holdings.<csv|parquet>    the holdings of every quarter report in long format
+    <directory>/<cik>_<view>.<csv|parquet>      the table of display_reports(view), one per --view
+
+Files are written to a temporary file first, so that a failed or interrupted run never leaves a truncated file.
+The progress is printed to stderr. The exit code is 0 if all funds were exported, 1 if any of them failed.
+
+Usage:
+    python export.py 0001067983 0001336528 --from-year 2022 --to-year 2024 --format parquet --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import form
+from report_collection import QuarterlyReportsCollection
+
+OUTPUT_FORMATS = ['csv', 'parquet']
+VIEWS = ['value', 'shares', 'fraction']
+
+
+class CollectionsExport:
+    """
+    A class to represent the export of the quarterly reports collections of several funds to files.
+
+    A fund that fails is recorded in failures and does not abort the others.
+
+    Attributes:
+        ciks (list): The Central Index Keys (CIKs) of the funds.
+        from_year (int): The first year of the reports.
+        to_year (int): The last year of the reports.
+        directory (str): The directory the files are written to.
+        output_format (str): 'csv' or 'parquet'.
+        views (list): The views of display_reports() written for each fund, any of 'value', 'shares' and 'fraction'.
+        max_workers (int): The number of funds built and written at the same time.
+        paths (dict): A map with the CIK of each exported fund as key and the list of its files as value.
+        failures (dict): A map with the CIK of each fund which could not be exported as key and the exception as
+            value.
+
+    Methods:
+        __init__(ciks, from_year, to_year, directory, output_format, views, max_workers):
+            Initializes the CollectionsExport object.
+
+        run(progress):
+            Builds and writes the collections of all funds.
+    """
+
+    def __init__(self, ciks, from_year, to_year, directory='.', output_format='csv', views=('value',),
+                 max_workers=4):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError("Invalid 'output_format' parameter. Use 'csv' or 'parquet'.")
+        if any(view not in VIEWS for view in views):
+            raise ValueError("Invalid 'views' parameter. Use 'shares', 'value', or 'fraction'.")
+
+        self.ciks = list(dict.fromkeys(ciks))
+        self.from_year = from_year
+        self.to_year = to_year
+        self.directory = directory
+        self.output_format = output_format
+        self.views = list(views)
+        self.max_workers = max_workers
+        self.paths = {}
+        self.failures = {}
+
+    def run(self, progress=None):
+        """
+        Build the collection of every fund on the pool and write its files.
+
+        Args:
+            progress (callable): Called with (cik, funds_done, funds_total, error) after every fund, error is None
+                if the fund was exported. Default is None.
+
+        Returns:
+            dict: The number of funds 'exported' and 'failed'.
+        """
+        self.paths = {}
+        self.failures = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._export_fund, cik): cik for cik in self.ciks}
+            for funds_done, future in enumerate(as_completed(futures), start=1):
+                cik = futures[future]
+                try:
+                    self.paths[cik] = future.result()
+                except Exception as error:
+                    self.failures[cik] = error
+                if progress is not None:
+                    progress(cik, funds_done, len(self.ciks), self.failures.get(cik))
+
+        return {'exported': len(self.paths), 'failed': len(self.failures)}
+
+    def _export_fund(self, cik):
+        """
+        Build the collection of a fund and write its holdings and views. Returns the paths written.
+        """
+        collection = QuarterlyReportsCollection(cik, self.from_year, self.to_year)
+        if not collection.reports:
+            raise LookupError(f"No reports found for {cik} in {self.from_year}-{self.to_year}")
+
+        tables = {'holdings': collection.get_holdings_table()}
+        for view in self.views:
+            tables[view] = collection.get_reports_frame(by=view)
+
+        paths = []
+        for name, table in tables.items():
+            path = os.path.join(self.directory, f"{cik}_{name}.{self.output_format}")
+            self._write_table(table, path)
+            paths.append(path)
+
+        return paths
+
+    def _write_table(self, table, path):
+        # Written to a temporary file first, so that a failure never leaves a truncated file
+        if self.output_format == 'csv':
+            table.to_csv(path + '.tmp', index=False)
+        else:
+            table.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the quarterly reports of funds to CSV or Parquet files.")
+    parser.add_argument('ciks', nargs='+', help="CIKs of the funds")
+    parser.add_argument('--from-year', type=int, required=True, help="first year of the reports")
+    parser.add_argument('--to-year', type=int, required=True, help="last year of the reports")
+    parser.add_argument('--directory', default='.', help="directory the files are written to")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help="format of the files")
+    parser.add_argument('--view', choices=VIEWS, action='append',
+                        help="display_reports() view written for each fund, can be repeated, default value")
+    parser.add_argument('--workers', type=int, default=4, help="number of funds exported at the same time")
+    parser.add_argument('--host', help="API host, default the SDK default")
+    parser.add_argument('--cache-dir', help="enable the persistent cache of forms in this directory")
+    args = parser.parse_args()
+
+    if args.host:
+        form.configure(host=args.host)
+    if args.cache_dir:
+        form.enable_cache(args.cache_dir)
+
+    start = time.perf_counter()
+
+    def print_progress(cik, done, total, error):
+        status = 'ok' if error is None else f"failed: {error!r}"
+        print(f"{done}/{total} {cik} {status} ({time.perf_counter() - start:.1f}s)", file=sys.stderr, flush=True)
+
+    export = CollectionsExport(args.ciks, args.from_year, args.to_year, directory=args.directory,
+                               output_format=args.format, views=args.view or ['value'], max_workers=args.workers)
+    counts = export.run(progress=print_progress)
+    print(f"{counts['exported']} exported, {counts['failed']} failed", file=sys.stderr)
+
+    sys.exit(1 if export.failures else 0)
@@ -1,9 +1,73 @@
+import os
+import sys
+import threading
+import time
 import forms13f
-from collections import defaultdict
-
-# Create api client with exponential backoff for 429 responses
-api_client = forms13f.ApiClient(n_retries=5)
-api_instance = forms13f.DefaultApi(api_client)
+import cache
+import instrumentation
+import rate_limit
+import singleflight
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+# Statistics of the API requests and processing stages, see instrumentation.ApiStats
+api_stats = instrumentation.ApiStats()
+
+PAGE_LIMIT = 250  # Maximum number of rows returned by a single paginated API call
+MAX_WORKERS = 4  # Default number of concurrent page or form requests
+AGGREGATE_BATCH_ROWS = 10000  # Minimum number of streamed rows grouped at once by CusipAggregator
+RATE_LIMIT = None  # Default sustained number of API requests per second shared by all threads, None for no limit
+RATE_BURST = 20  # Default number of API requests sent back to back after an idle period
+POOL_SIZE = MAX_WORKERS * MAX_WORKERS  # Default keep-alive connections, forms times pages requested at once
+
+# The api client with exponential backoff for 429 responses is created on first use, see get_api_instance()
+_client_settings = {'host': None, 'n_retries': 5, 'pool_size': POOL_SIZE}
+_client_lock = threading.Lock()
+_api_client = None
+_api_instance = None
+
+HEADERS_MEMO_TTL = 60  # Seconds a list of form headers is served from memory
+
+# Concurrent identical API calls share one request, see _call_api()
+api_calls = singleflight.SingleFlight()
+
+# Lists of form headers by (cik, from_date, to_date), as (monotonic time fetched, headers)
+_headers_memo = {}
+
+# Token bucket spacing the requests of all threads below the server limit, enabled with configure(rate=...)
+rate_limiter = rate_limit.TokenBucket(RATE_LIMIT, RATE_BURST) if RATE_LIMIT else None
+
+HOLDING_COLUMNS = [
+    'accession_number',
+    'cik',
+    'name_of_issuer',
+    'title_of_class',
+    'cusip',
+    'ticker',
+    'value',
+    'ssh_prnamt',
+    'ssh_prnamt_type',
+    'investment_discretion',
+    'voting_authority_sole',
+    'voting_authority_shared',
+    'voting_authority_none'
+]
+SUMMED_COLUMNS = ['value', 'ssh_prnamt', 'voting_authority_sole', 'voting_authority_shared', 'voting_authority_none']
+CATEGORY_COLUMNS = [
+    'accession_number',
+    'cik',
+    'name_of_issuer',
+    'title_of_class',
+    'ticker',
+    'ssh_prnamt_type',
+    'investment_discretion'
+]
+
+# Persistent cache of forms, enabled with enable_cache() or the FORMS13F_CACHE_DIR environment variable
+filing_cache = cache.FilingCache(os.environ['FORMS13F_CACHE_DIR']) if os.environ.get('FORMS13F_CACHE_DIR') else None
 
 
 class Form:
@@ -12,102 +76,306 @@ class Form:
 
     Attributes:
         header (forms13f.ApiV1Form): The header information of the form.
-        holdings (list): A list of holdings associated with the form.
+        holdings_table (pandas.DataFrame): The holdings of the form aggregated by CUSIP, one column per
+            ApiV1FormEntry field.
+        holdings (list): The holdings of the form as ApiV1FormEntry objects, built from holdings_table on access.
 
     Methods:
-        __init__(header, cik, accession_number):
-            Initializes the Form object with header, CIK, and accession number.
+        __init__(header, cik, accession_number, max_workers, holdings):
+            Initializes the Form object with header, CIK, and accession number. The raw holdings rows of the
+            form can be passed in when they were already retrieved, otherwise they are fetched from the API.
 
-        _get_holdings(cik, accession_number):
+        _get_holdings(cik, accession_number, max_workers):
             Retrieves and consolidates holdings for the given CIK and accession number.
-
-        consolidate_holdings(forms):
-            Static method to consolidate holdings from an array of Form objects.
     """
 
-    def __init__(self, header: forms13f.ApiV1Form, cik: str, accession_number: str):
+    def __init__(self, header: forms13f.ApiV1Form, cik: str, accession_number: str, max_workers: int = MAX_WORKERS,
+                 holdings: list = None):
         self.header = header
-        self.holdings = self._get_holdings(cik, accession_number)
-
-    def _get_holdings(self, cik, accession_number):
-        offset = 0
-        limit = 250
-        all_holdings = []
-
-        while True:
-            api_response = api_instance.api_v1_form_get(accession_number, cik, offset=offset, limit=limit)
-
-            if not api_response:
-                break
-
-            all_holdings.extend(api_response)
-            offset += limit
-
-        holdings_by_cusip = defaultdict(lambda: {
-            'accession_number': None,
-            'cik': None,
-            'ticker': None,
-            'name_of_issuer': None,
-            'title_of_class': None,
-            'cusip': None,
-            'value': 0,
-            'ssh_prnamt': 0,
-            'ssh_prnamt_type': None,
-            'investment_discretion': None,
-            'voting_authority_sole': 0,
-            'voting_authority_shared': 0,
-            'voting_authority_none': 0
-        })
-
-        for holding in all_holdings:
-            cusip = holding.cusip
-            if holdings_by_cusip[cusip]['accession_number'] is None:
-                holdings_by_cusip[cusip]['accession_number'] = holding.accession_number
-                holdings_by_cusip[cusip]['cik'] = holding.cik
-                holdings_by_cusip[cusip]['name_of_issuer'] = holding.name_of_issuer
-                holdings_by_cusip[cusip]['title_of_class'] = holding.title_of_class
-                holdings_by_cusip[cusip]['cusip'] = holding.cusip
-                holdings_by_cusip[cusip]['ticker'] = holding.ticker
-                holdings_by_cusip[cusip]['ssh_prnamt_type'] = holding.ssh_prnamt_type
-                holdings_by_cusip[cusip]['investment_discretion'] = holding.investment_discretion
-
-            holdings_by_cusip[cusip]['value'] += holding.value
-            holdings_by_cusip[cusip]['ssh_prnamt'] += holding.ssh_prnamt
-            holdings_by_cusip[cusip]['voting_authority_sole'] += holding.voting_authority_sole
-            holdings_by_cusip[cusip]['voting_authority_shared'] += holding.voting_authority_shared
-            holdings_by_cusip[cusip]['voting_authority_none'] += holding.voting_authority_none
-
-        unique_holdings = [
-            forms13f.ApiV1FormEntry(
-                accession_number=holding['accession_number'],
-                cik=holding['cik'],
-                name_of_issuer=holding['name_of_issuer'],
-                title_of_class=holding['title_of_class'],
-                cusip=holding['cusip'],
-                ticker=holding['ticker'],
-                value=holding['value'],
-                ssh_prnamt=holding['ssh_prnamt'],
-                ssh_prnamt_type=holding['ssh_prnamt_type'],
-                investment_discretion=holding['investment_discretion'],
-                voting_authority_sole=holding['voting_authority_sole'],
-                voting_authority_shared=holding['voting_authority_shared'],
-                voting_authority_none=holding['voting_authority_none']
-            )
-            for holding in holdings_by_cusip.values()
-        ]
-
-        sorted_holdings = sorted(unique_holdings, key=lambda holding: holding.name_of_issuer)
-
-        return sorted_holdings
-
-
-@staticmethod
+        if holdings is None:
+            self.holdings_table = self._get_holdings(cik, accession_number, max_workers)
+        else:
+            self.holdings_table = aggregate_by_cusip(holdings_to_table(holdings))
+
+    @property
+    def holdings(self):
+        return table_to_holdings(self.holdings_table)
+
+    def _get_holdings(self, cik, accession_number, max_workers=MAX_WORKERS):
+        all_holdings = fetch_holdings(cik, accession_number, self.header.table_entry_total, max_workers)
+
+        with api_stats.stage('aggregate'):
+            return aggregate_by_cusip(holdings_to_table(all_holdings))
+
+
+def holdings_to_table(holdings):
+    """
+    Convert a list of ApiV1FormEntry objects to a DataFrame with one column per field.
+
+    Args:
+        holdings (list): A list of forms13f.ApiV1FormEntry objects.
+
+    Returns:
+        pandas.DataFrame: A DataFrame with the HOLDING_COLUMNS columns, missing amounts set to 0.
+    """
+    table = pd.DataFrame({column: [getattr(holding, column) for holding in holdings] for column in HOLDING_COLUMNS})
+    table[SUMMED_COLUMNS] = table[SUMMED_COLUMNS].fillna(0).astype('int64')
+
+    return table
+
+
+def aggregate_by_cusip(table):
+    """
+    Aggregate the rows of a holdings table which share the same CUSIP.
+
+    Amounts are summed and the descriptive columns are taken from the first row of each CUSIP. The result is
+    sorted by name_of_issuer, CUSIPs with the same issuer name keep the order of their first row.
+
+    Args:
+        table (pandas.DataFrame): A holdings table as returned by holdings_to_table().
+
+    Returns:
+        pandas.DataFrame: A holdings table with one row per CUSIP and categorical string columns.
+    """
+    return _sort_by_issuer(_group_by_cusip(table))
+
+
+class CusipAggregator:
+    """
+    A class to aggregate a stream of holdings pages by CUSIP.
+
+    The rows aggregated so far are kept one per CUSIP, and pages are buffered until they are at least as many
+    rows as these, or AGGREGATE_BATCH_ROWS. Memory is bounded by the number of distinct CUSIPs rather than by the
+    number of rows consumed, and the grouping time stays linear in the number of rows. The result is the same as aggregate_by_cusip() over
+    all the rows.
+
+    Attributes:
+        row_count (int): The number of rows consumed so far.
+
+    Methods:
+        add(holdings):
+            Aggregates a page of ApiV1FormEntry objects or a holdings table.
+
+        result():
+            Returns the holdings table aggregated so far, sorted by name_of_issuer.
+    """
+
+    def __init__(self):
+        self.row_count = 0
+        self._table = None
+        self._pages = []
+        self._buffered_rows = 0
+
+    def add(self, holdings):
+        table = holdings if isinstance(holdings, pd.DataFrame) else holdings_to_table(holdings)
+        self.row_count += len(table)
+        self._pages.append(table)
+        self._buffered_rows += len(table)
+
+        # Pages are grouped in batches at least as large as the table aggregated so far, so regrouping that table
+        # costs no more than grouping the batch, instead of once per page
+        aggregated_rows = 0 if self._table is None else len(self._table)
+        if self._buffered_rows >= max(AGGREGATE_BATCH_ROWS, aggregated_rows):
+            self._aggregate_pages()
+
+    def result(self):
+        self._aggregate_pages()
+        if self._table is None:
+            return aggregate_by_cusip(holdings_to_table([]))
+
+        return _sort_by_issuer(self._table)
+
+    def _aggregate_pages(self):
+        if not self._pages:
+            return
+
+        # The rows aggregated so far come first so that the first row of each CUSIP is kept
+        tables = self._pages if self._table is None else [self._table] + self._pages
+        self._table = _group_by_cusip(
+            pd.concat(tables, ignore_index=True).astype({column: object for column in CATEGORY_COLUMNS})
+        )
+        self._pages = []
+        self._buffered_rows = 0
+
+
+def table_to_holdings(table):
+    """
+    Convert a holdings table back to a list of ApiV1FormEntry objects.
+
+    Args:
+        table (pandas.DataFrame): A holdings table with the HOLDING_COLUMNS columns, or None.
+
+    Returns:
+        list: A list of forms13f.ApiV1FormEntry objects in the order of the table rows, or None if table is None.
+    """
+    if table is None:
+        return None
+
+    records = table[HOLDING_COLUMNS].astype(object)
+    records = records.where(records.notna(), None)
+
+    return [forms13f.ApiV1FormEntry(**record) for record in records.to_dict('records')]
+
+
+def _group_by_cusip(table):
+    first_columns = [column for column in HOLDING_COLUMNS if column not in SUMMED_COLUMNS and column != 'cusip']
+
+    # The descriptive columns of the first row of each CUSIP, nulls included, unlike GroupBy.first()
+    first_rows = table.drop_duplicates('cusip').set_index('cusip')[first_columns]
+    sums = table.groupby('cusip', sort=False, dropna=False)[SUMMED_COLUMNS].sum()
+    aggregated = first_rows.join(sums).reset_index()
+
+    return aggregated[HOLDING_COLUMNS]
+
+
+def _sort_by_issuer(table):
+    # Stable sort so that holdings with the same issuer name keep their relative order
+    table = table.sort_values(by='name_of_issuer', kind='stable', ignore_index=True)
+
+    # Issuer, ticker and class strings repeat a lot, store them as categories
+    return table.assign(**{column: _to_category(table[column]) for column in CATEGORY_COLUMNS})
+
+
+def _to_category(column):
+    # The categories are interned Python strings, so the same issuer name or ticker is stored once for all the
+    # forms, quarters and funds in memory instead of once per table
+    codes, uniques = pd.factorize(column.astype(object), sort=True)
+    categories = pd.Index([sys.intern(value) if isinstance(value, str) else value for value in uniques], dtype=object)
+
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def fetch_holdings(cik, accession_number, table_entry_total=None, max_workers=MAX_WORKERS):
+    """
+    Retrieve all raw holdings rows of a form, one /api/v1/form page per request.
+
+    When the number of entries is known from the form header, the offsets of all pages are computed up front
+    and the pages are requested concurrently by a pool of at most max_workers threads, with no request past the
+    last of them. The pages share the module api_client, so each of them still goes through its exponential
+    backoff on 429 responses. Without a number of entries, the pages are walked sequentially until a short one.
+
+    Args:
+        cik (str): The Central Index Key (CIK) of the filer.
+        accession_number (str): The accession number of the form.
+        table_entry_total (int): The number of entries reported in the form header, or None if unknown.
+        max_workers (int): The maximum number of pages requested at the same time. Use 1 to fetch sequentially.
+
+    Returns:
+        list: The ApiV1FormEntry rows of the form in the order returned by the API.
+    """
+    if filing_cache is not None:
+        cached_holdings = filing_cache.get_holdings(cik, accession_number)
+        if cached_holdings is not None:
+            return cached_holdings
+
+    all_holdings = _fetch_holdings(cik, accession_number, table_entry_total, max_workers)
+
+    if filing_cache is not None:
+        filing_cache.put_holdings(cik, accession_number, all_holdings)
+
+    return all_holdings
+
+
+def iter_form_holdings(cik, accession_number, table_entry_total=None, max_workers=MAX_WORKERS):
+    """
+    Yield the raw holdings rows of a form page by page.
+
+    At most max_workers pages are requested ahead of the page being consumed, so memory does not grow with the
+    size of the form. The pages are yielded in offset order. A form in the persistent cache is served from it,
+    but streamed forms are not written to the cache, use fetch_holdings() for that.
+
+    Args:
+        cik (str): The Central Index Key (CIK) of the filer.
+        accession_number (str): The accession number of the form.
+        table_entry_total (int): The number of entries reported in the form header, or None if unknown.
+        max_workers (int): The maximum number of pages requested at the same time. Use 1 to fetch sequentially.
+
+    Yields:
+        list: The ApiV1FormEntry rows of the next page, at most PAGE_LIMIT of them.
+    """
+    if filing_cache is not None:
+        cached_holdings = filing_cache.get_holdings(cik, accession_number)
+        if cached_holdings is not None:
+            for start in range(0, len(cached_holdings), PAGE_LIMIT):
+                yield cached_holdings[start:start + PAGE_LIMIT]
+            return
+
+    yield from _iter_holdings_pages(cik, accession_number, table_entry_total, max_workers)
+
+
+def _fetch_holdings(cik, accession_number, table_entry_total, max_workers):
+    all_holdings = []
+
+    for page in _iter_holdings_pages(cik, accession_number, table_entry_total, max_workers):
+        all_holdings.extend(page)
+
+    return all_holdings
+
+
+def _iter_holdings_pages(cik, accession_number, table_entry_total, max_workers):
+    if table_entry_total:
+        offsets = list(range(0, table_entry_total, PAGE_LIMIT))
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(offsets))) as executor:
+            # Keep at most max_workers pages in flight and yield them in offset order
+            pending = deque()
+            for page_offset in offsets:
+                if len(pending) == max_workers:
+                    page = pending.popleft().result()
+                    if page:
+                        yield page
+                pending.append(executor.submit(_get_holdings_page, cik, accession_number, page_offset))
+
+            while pending:
+                page = pending.popleft().result()
+                if page:
+                    yield page
+
+        # The header total is trusted, so a full last page is not followed by a request for an empty one
+        return
+
+    # Without a total, pages are walked until a short one
+    offset = 0
+    while True:
+        page = _get_holdings_page(cik, accession_number, offset)
+        if page:
+            yield page
+
+        if len(page) < PAGE_LIMIT:
+            break
+
+        offset += PAGE_LIMIT
+
+
+def _get_holdings_page(cik, accession_number, offset):
+    return _call_api('/api/v1/form', get_api_instance().api_v1_form_get, accession_number, cik, offset=offset,
+                     limit=PAGE_LIMIT) or []
+
+
+def _call_api(endpoint, method, *args, **kwargs):
+    # Threads requesting the same endpoint with the same arguments at the same time share one request and its
+    # result, which must therefore not be modified by the caller
+    key = (endpoint, args, tuple(sorted(kwargs.items())))
+    return api_calls.do(key, _timed_call, endpoint, method, *args, **kwargs)
+
+
+def _timed_call(endpoint, method, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        api_response = method(*args, **kwargs)
+    except Exception as error:
+        api_stats.record_call(endpoint, time.perf_counter() - start, error)
+        raise
+    api_stats.record_call(endpoint, time.perf_counter() - start)
+
+    return api_response
+
+
 def consolidate_holdings(forms):
     """
     Consolidate holdings from an array of Form objects.
 
-    This method ensures all forms have the same period of report, sorts the forms by their filed_as_of_date,
-    and consolidates the holdings considering amendments.
+    This is the ApiV1FormEntry based variant of consolidate_holdings_table().
 
     Args:
         forms (list): A list of Form objects to be consolidated.
@@ -121,6 +389,29 @@ def consolidate_holdings(forms):
     if not forms:
         return []
 
+    return table_to_holdings(consolidate_holdings_table(forms))
+
+
+def consolidate_holdings_table(forms):
+    """
+    Consolidate the holdings tables of an array of Form objects.
+
+    This method ensures all forms have the same period of report, sorts the forms by their filed_as_of_date,
+    and consolidates the holdings considering amendments. The holdings of the forms left after the last
+    RESTATEMENT are merged with merge_holdings_tables(), the forms are not modified.
+
+    Args:
+        forms (list): A list of Form objects to be consolidated.
+
+    Returns:
+        pandas.DataFrame: A holdings table of the consolidated holdings sorted by name_of_issuer.
+
+    Raises:
+        ValueError: If forms have different period_of_report or if there are multiple forms with is_amendment=None.
+    """
+    if not forms:
+        return holdings_to_table([])
+
     # Ensure all forms have the same period_of_report
     period_of_report = forms[0].header.period_of_report
     for form in forms:
@@ -137,64 +428,392 @@ def consolidate_holdings(forms):
     if non_amendment_form and non_amendment_form[0] != form_reports[0]:
         raise ValueError("The form with is_amendment=None must be the first in the sorted list")
 
-    # Start with the first in the list as final_report
-    final_report = form_reports[0]
-    final_holdings = final_report.holdings
-
-    # Iterate over remaining items in the list
+    # A single pass over the chain: a RESTATEMENT replaces all the holdings before it, NEW HOLDINGS add to them
+    final_tables = [form_reports[0].holdings_table]
     for form in form_reports[1:]:
         if form.header.amendment_type == 'RESTATEMENT':
-            final_report = form
-            final_holdings = form.holdings
+            final_tables = [form.holdings_table]
         elif form.header.amendment_type == 'NEW HOLDINGS':
-            final_holdings.extend(form.holdings)
+            final_tables.append(form.holdings_table)
+
+    return merge_holdings_tables(final_tables)
+
+
+def apply_amendment(holdings_table, form):
+    """
+    Apply an amendment filed after the forms a consolidated holdings table was built from.
+
+    This is the incremental variant of consolidate_holdings_table(): when a late amendment arrives, only the
+    consolidated table and the new form are merged, the forms of the chain are not consolidated again.
+
+    Args:
+        holdings_table (pandas.DataFrame): The consolidated holdings table of the period, it is not modified.
+        form (Form): The amendment, filed after all the forms of holdings_table.
+
+    Returns:
+        pandas.DataFrame: The holdings table of the amendment for a RESTATEMENT, the merged holdings table for
+        NEW HOLDINGS and holdings_table itself for any other form.
+    """
+    if form.header.amendment_type == 'RESTATEMENT':
+        return form.holdings_table
+    if form.header.amendment_type == 'NEW HOLDINGS':
+        return merge_holdings_tables([holdings_table, form.holdings_table])
+
+    return holdings_table
+
+
+def merge_holdings_tables(tables):
+    """
+    Merge holdings tables by CUSIP, summing the shares and values of a CUSIP reported in several tables.
+
+    The descriptive columns of a CUSIP are taken from the first table reporting it. The tables are not modified,
+    a single table is returned as is. As every table is sorted by name_of_issuer, the rows grouped in order of
+    first appearance form already sorted runs, which the final stable sort merges in linear time. Holdings with the
+    same issuer name keep the order of the tables.
+
+    Args:
+        tables (list): Holdings tables aggregated by CUSIP and sorted by name_of_issuer, e.g. Form.holdings_table.
+
+    Returns:
+        pandas.DataFrame: A holdings table with one row per CUSIP sorted by name_of_issuer.
+    """
+    if not tables:
+        return holdings_to_table([])
+    if len(tables) == 1:
+        return tables[0]
+
+    # Categories differ from table to table, plain strings are concatenated and grouped without recoding
+    merged = pd.concat(
+        [table.astype({column: object for column in CATEGORY_COLUMNS}) for table in tables], ignore_index=True
+    )
+
+    return aggregate_by_cusip(merged)
+
+
+def get_form_headers(cik, from_date, to_date, cached=True):
+    """
+    Retrieve the headers of all forms filed by a CIK for a range of periods of report.
+
+    The /api/v1/forms endpoint is walked page by page until a short page is returned, so the result is not
+    truncated to the first PAGE_LIMIT forms.
+
+    Args:
+        cik (str): The Central Index Key (CIK) of the filer.
+        from_date (str): All forms returned will be on or after this period of report date, in the format 'YYYY-MM-DD'.
+        to_date (str): All forms returned will be on or before this period of report date, in the format 'YYYY-MM-DD'.
+        cached (bool): Whether a list of headers from the in-memory memo or the persistent cache can be returned.
+            When False, the headers are always requested from the API and the memo and cache are updated.
+
+    Returns:
+        list: A list of forms13f.ApiV1Form headers in the order returned by the API.
+    """
+    memo_key = (cik, str(from_date), str(to_date))
+    if cached:
+        # Repeated lookups within a session are served from memory for HEADERS_MEMO_TTL seconds
+        memo = _headers_memo.get(memo_key)
+        if memo is not None and time.monotonic() - memo[0] < HEADERS_MEMO_TTL:
+            return list(memo[1])
+
+    if filing_cache is not None and cached:
+        cached_headers = filing_cache.get_headers(cik, from_date, to_date)
+        if cached_headers is not None:
+            _headers_memo[memo_key] = (time.monotonic(), cached_headers)
+            return list(cached_headers)
+
+    headers = _fetch_form_headers(cik, from_date, to_date)
+    _headers_memo[memo_key] = (time.monotonic(), headers)
+
+    if filing_cache is not None:
+        filing_cache.put_headers(cik, from_date, to_date, headers)
+
+    return list(headers)
+
+
+def _fetch_form_headers(cik, from_date, to_date):
+    headers = []
+    offset = 0
+
+    while True:
+        api_response = _call_api('/api/v1/forms', get_api_instance().api_v1_forms_get, cik, from_date, to_date,
+                                 offset=offset, limit=PAGE_LIMIT) or []
+        headers.extend(api_response)
 
-    # Sort the final holdings by name_of_issuer
-    final_holdings = sorted(final_holdings, key=lambda holding: holding.name_of_issuer)
+        if len(api_response) < PAGE_LIMIT:
+            break
 
-    return final_holdings
+        offset += PAGE_LIMIT
 
+    return headers
 
-def get_forms_for_period(cik, period_of_report):
+
+def get_filing_headers(from_date, to_date):
+    """
+    Retrieve the headers of all forms filed by any filer in a range of filing dates.
+
+    The /api/v1/filings endpoint is walked page by page until a short page is returned. Forms filed while the
+    pages are walked can shift the pages, headers seen twice are only returned once.
+
+    Args:
+        from_date (str): All forms returned were filed on or after this date, in the format 'YYYY-MM-DD'.
+        to_date (str): All forms returned were filed on or before this date, in the format 'YYYY-MM-DD'.
+
+    Returns:
+        list: A list of forms13f.ApiV1Form headers in the order returned by the API.
+    """
+    headers = []
+    accession_numbers = set()
+    offset = 0
+
+    while True:
+        api_response = _call_api('/api/v1/filings', get_api_instance().api_v1_filings_get, from_date, to_date,
+                                 offset=offset, limit=PAGE_LIMIT) or []
+        for header in api_response:
+            if header.accession_number not in accession_numbers:
+                accession_numbers.add(header.accession_number)
+                headers.append(header)
+
+        if len(api_response) < PAGE_LIMIT:
+            break
+
+        offset += PAGE_LIMIT
+
+    return headers
+
+
+def get_forms_for_period(cik, period_of_report, max_workers=MAX_WORKERS):
     """
     Retrieve and return a list of Form objects for a given CIK and period of report.
 
     Args:
         cik (str): The Central Index Key (CIK) of the entity for which forms are to be retrieved.
         period_of_report (str): The period of report date in the format 'YYYY-MM-DD'. All forms returned will be on or after this date.
+        max_workers (int): The maximum number of holdings pages requested at the same time for each form.
 
     Returns:
         list: A list of Form objects sorted by their filed_as_of_date in ascending order.
     """
-    from_date = period_of_report  # String | All forms returned will be on or after this period of report date.
-    to_date = period_of_report  # String | All forms returned will be on or before this period of report date.
-    offset = 0  # Integer | Skip the first offset forms. (optional) (default to 0)
-    limit = 250  # Integer | Return at most limit forms. (optional) (default to 100)
+    forms_by_period = get_forms_for_range(cik, period_of_report, period_of_report, max_workers)
+
+    return forms_by_period.get(period_of_report, [])
+
+
+def get_forms_for_range(cik, from_date, to_date, max_workers=MAX_WORKERS):
+    """
+    Retrieve the Form objects of a CIK for every period of report in a date range.
+
+    All headers of the range are listed first with a single paginated query and grouped by period of report.
+    Only then are the holdings of the forms fetched, up to max_workers forms at a time.
 
-    api_response = api_instance.api_v1_forms_get(cik, from_date, to_date, offset=offset, limit=limit)
+    Args:
+        cik (str): The Central Index Key (CIK) of the filer.
+        from_date (str): The first period of report date in the format 'YYYY-MM-DD'.
+        to_date (str): The last period of report date in the format 'YYYY-MM-DD'.
+        max_workers (int): The maximum number of forms, and of pages per form, requested at the same time.
+
+    Returns:
+        dict: A map with the period of report in the format 'YYYY-MM-DD' as key and the list of its Form objects
+        sorted by filed_as_of_date in ascending order as value.
+    """
+    headers = get_form_headers(cik, from_date, to_date)
 
+    return group_forms_by_period(get_forms_for_headers(headers, max_workers))
+
+
+def get_forms_for_headers(headers, max_workers=MAX_WORKERS):
+    """
+    Create the Form objects of a list of form headers, fetching the holdings of up to max_workers forms at a time.
+
+    Args:
+        headers (list): A list of forms13f.ApiV1Form headers.
+        max_workers (int): The maximum number of forms, and of pages per form, requested at the same time.
+
+    Returns:
+        list: A list of Form objects sorted by their filed_as_of_date in ascending order.
+    """
     # Sort the reports by filed_as_of_date in ascending order
-    sorted_forms = sorted(api_response, key=lambda form: form.filed_as_of_date)
+    sorted_headers = sorted(headers, key=lambda header: header.filed_as_of_date)
 
-    # Create Form objects for each sorted form
-    form_objects = [Form(header=form, cik=form.cik, accession_number=form.accession_number) for form in sorted_forms]
+    # Create Form objects for each sorted form, map() keeps them in filing order
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sorted_headers)))) as executor:
+        form_objects = list(executor.map(
+            lambda header: Form(header=header, cik=header.cik, accession_number=header.accession_number,
+                                max_workers=max_workers),
+            sorted_headers
+        ))
 
     return form_objects
 
 
-def get_ciks_by_name(name):
+def group_forms_by_period(forms):
+    """
+    Group Form objects by their period of report.
+
+    Args:
+        forms (list): A list of Form objects.
+
+    Returns:
+        dict: A map with the period of report in the format 'YYYY-MM-DD' as key and the list of its Form objects,
+        in the order of forms, as value.
+    """
+    forms_by_period = defaultdict(list)
+    for form in forms:
+        forms_by_period[str(form.header.period_of_report)].append(form)
+
+    return dict(forms_by_period)
+
+
+def configure(host=None, n_retries=5, rate=RATE_LIMIT, burst=RATE_BURST, pool_size=POOL_SIZE):
+    """
+    Replace the shared API client, e.g. to point it at a local stub server.
+
+    The client is created with these settings on the next request. With a rate, all threads share one token
+    bucket, so the requests are spread below rate instead of being sent in bursts and backed off after 429
+    responses.
+
+    Args:
+        host (str): The base URL of the API, e.g. 'http://127.0.0.1:8000'. Default is the SDK default host.
+        n_retries (int): The number of retries with exponential backoff on 429 responses.
+        rate (float): The sustained number of requests per second, or None to disable the rate limit. Default is
+            RATE_LIMIT, no limit: requests are only backed off after 429 responses.
+        burst (int): The number of requests sent back to back after an idle period.
+        pool_size (int): The number of keep-alive connections of the client, at least the number of requests
+            sent at the same time, e.g. max_workers * max_workers.
+    """
+    global _api_client, _api_instance, rate_limiter
+    with _client_lock:
+        _client_settings.update(host=host, n_retries=n_retries, pool_size=pool_size)
+        rate_limiter = rate_limit.TokenBucket(rate, burst) if rate else None
+        _api_client = None
+        _api_instance = None
+        _headers_memo.clear()
+
+
+def get_api_instance():
+    """
+    Return the shared API instance, creating its client on first use with the settings given to configure().
+
+    Returns:
+        forms13f.DefaultApi: The API instance used by all requests of this package.
+    """
+    global _api_client, _api_instance
+    api_instance = _api_instance
+    if api_instance is not None:
+        return api_instance
+
+    with _client_lock:
+        if _api_instance is None:
+            host = _client_settings['host']
+            configuration = forms13f.Configuration(host=host) if host else forms13f.Configuration()
+            configuration.connection_pool_maxsize = _client_settings['pool_size']
+            _api_client = forms13f.ApiClient(configuration=configuration, n_retries=_client_settings['n_retries'])
+            _api_instance = forms13f.DefaultApi(_api_client)
+            instrumentation.instrument_client(_api_client, api_stats)
+            # Outermost, so that the HTTP latencies recorded do not include the wait for a token
+            rate_limit.limit_client(_api_client, lambda: rate_limiter, api_stats)
+
+        return _api_instance
+
+
+def __getattr__(name):
+    # api_client and api_instance used to be created at import time, they are now created on first access
+    if name == 'api_instance':
+        return get_api_instance()
+    if name == 'api_client':
+        get_api_instance()
+        return _api_client
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def enable_cache(directory=None, headers_ttl=cache.HEADERS_TTL, max_size=cache.MAX_SIZE):
+    """
+    Enable the persistent on-disk cache of form holdings and form headers.
+
+    Args:
+        directory (str): The directory of the cache database. Default is ~/.cache/forms13f.
+        headers_ttl (int): Number of seconds a cached list of form headers stays valid.
+        max_size (int): Maximum number of bytes kept before the least recently used entries are evicted.
+
+    Returns:
+        cache.FilingCache: The cache used by all subsequent requests.
+    """
+    global filing_cache
+    filing_cache = cache.FilingCache(directory, headers_ttl, max_size)
+    return filing_cache
+
+
+def disable_cache():
+    """
+    Disable the persistent cache and clear the in-memory header memo, all subsequent requests go to the API.
+    """
+    global filing_cache
+    filing_cache = None
+    clear_memo()
+
+
+def clear_memo():
+    """
+    Clear the in-memory lists of form headers, so that the next get_form_headers() calls list them again.
+    """
+    _headers_memo.clear()
+
+
+def get_settings():
+    """
+    Return the settings of the shared API client and of the persistent cache, e.g. to apply them in a worker
+    process with apply_settings().
+
+    Returns:
+        dict: The arguments of configure(), and the arguments of enable_cache() as 'cache', or None if the cache
+        is disabled.
+    """
+    with _client_lock:
+        settings = dict(_client_settings, rate=rate_limiter.rate if rate_limiter else None,
+                        burst=rate_limiter.burst if rate_limiter else RATE_BURST)
+    current_cache = filing_cache
+    settings['cache'] = None if current_cache is None else {
+        'directory': current_cache.directory,
+        'headers_ttl': current_cache.headers_ttl,
+        'max_size': current_cache.max_size,
+    }
+
+    return settings
+
+
+def apply_settings(settings):
+    """
+    Configure the shared API client and the persistent cache with settings returned by get_settings().
+
+    Args:
+        settings (dict): The settings, e.g. of the parent process.
+    """
+    configure(host=settings['host'], n_retries=settings['n_retries'], rate=settings['rate'], burst=settings['burst'],
+              pool_size=settings['pool_size'])
+    if settings['cache'] is None:
+        disable_cache()
+    else:
+        enable_cache(**settings['cache'])
+
+
+def get_ciks_by_name(name, name_index=None):
     """
     Retrieve a list of Central Index Keys (CIKs) for funds that match the given name substring.
 
     Args:
         name (str): The name substring to search for matching funds.
+        name_index (name_index.FundNameIndex): A local index of fund names to search without any API request,
+            with fuzzy matching. Default is None, a live /api/v1/funds lookup of at most 10 funds.
 
     Returns:
         list: A list of CIKs for funds that match the given name substring.
     """
+    if name_index is not None:
+        return name_index.get_ciks(name)
+
     offset = 0  # Integer | Skip previous offset companies (optional) (default to 0)
     limit = 10  # Integer | Return max limit companies (optional) (default to 100)
 
-    api_response = api_instance.api_v1_funds_get(name=name, offset=offset, limit=limit)
+    api_response = _call_api('/api/v1/funds', get_api_instance().api_v1_funds_get, name=name, offset=offset,
+                             limit=limit)
 
     return [fund.cik for fund in api_response]
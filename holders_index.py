@@ -0,0 +1,225 @@
+import os
+import sqlite3
+import threading
+
+import cache
+import changes
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+HOLDER_COLUMNS = ['cusip', 'report_quarter', 'cik', 'name_of_issuer', 'ticker', 'ssh_prnamt', 'value']
+
+
+class HoldersIndex:
+    """
+    A class to represent a persistent inverted index from CUSIP to the funds holding it, stored in SQLite.
+
+    Each row is the consolidated position of one fund in one CUSIP for one quarter. Rows are clustered on
+    (cusip, report_quarter, cik), so the holders of a CUSIP in a quarter or a range of quarters are read with a
+    single index range scan whatever the number of funds indexed. Reports are indexed incrementally: adding a
+    report replaces the rows of its fund and quarter, and is skipped when the same forms were already indexed.
+
+    Attributes:
+        path (str): The path of the index database.
+
+    Methods:
+        __init__(path):
+            Initializes the HoldersIndex object and creates the database if needed.
+
+        add_report(quarter_report):
+            Indexes the holdings of a QuarterReport.
+
+        add_collection(collection):
+            Indexes the reports of a QuarterlyReportsCollection which are not indexed yet.
+
+        holders(cusip, quarter):
+            Returns the funds holding a CUSIP in a quarter.
+
+        holders_range(cusip, from_quarter, to_quarter):
+            Returns the funds holding a CUSIP in a range of quarters.
+
+        holder_changes(cusip, from_quarter, to_quarter):
+            Returns the quarter over quarter changes of the funds holding a CUSIP.
+
+        quarters(cik):
+            Returns the indexed quarters.
+
+        clear():
+            Removes all entries from the index.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(cache.DEFAULT_CACHE_DIR, 'holders.sqlite')
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS positions (
+                    cusip TEXT NOT NULL,
+                    report_quarter TEXT NOT NULL,
+                    cik TEXT NOT NULL,
+                    name_of_issuer TEXT,
+                    ticker TEXT,
+                    ssh_prnamt INTEGER NOT NULL,
+                    value INTEGER NOT NULL,
+                    PRIMARY KEY (cusip, report_quarter, cik)
+                ) WITHOUT ROWID""")
+            # Replacing a report deletes the rows of its fund and quarter
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS positions_by_report ON positions (cik, report_quarter)"
+            )
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    cik TEXT NOT NULL,
+                    report_quarter TEXT NOT NULL,
+                    accession_numbers TEXT NOT NULL,
+                    PRIMARY KEY (cik, report_quarter)
+                )""")
+
+    def add_report(self, quarter_report):
+        """
+        Index the consolidated holdings of a quarter report, replacing the rows of its fund and quarter.
+
+        Args:
+            quarter_report (report.QuarterReport): The report, with a header and a holdings_table.
+
+        Returns:
+            bool: True if the report was indexed, False if the same forms were already indexed.
+        """
+        header = quarter_report.header
+        if header is None or quarter_report.holdings_table is None:
+            return False
+
+        cik = header.cik
+        quarter = header.report_quarter
+        accession_numbers = ','.join(sorted(header.accession_numbers))
+        table = quarter_report.holdings_table.groupby('cusip', sort=False).agg(
+            name_of_issuer=('name_of_issuer', 'first'),
+            ticker=('ticker', 'first'),
+            ssh_prnamt=('ssh_prnamt', 'sum'),
+            value=('value', 'sum'),
+        ).reset_index()
+        rows = zip(
+            table['cusip'].tolist(),
+            table['name_of_issuer'].astype(object).tolist(),
+            table['ticker'].astype(object).where(table['ticker'].notna(), None).tolist(),
+            table['ssh_prnamt'].astype('int64').tolist(),
+            table['value'].astype('int64').tolist(),
+        )
+
+        with self._lock, self._connection:
+            indexed = self._connection.execute(
+                "SELECT accession_numbers FROM reports WHERE cik = ? AND report_quarter = ?", (cik, quarter)
+            ).fetchone()
+            if indexed is not None and indexed[0] == accession_numbers:
+                return False
+
+            self._connection.execute("DELETE FROM positions WHERE cik = ? AND report_quarter = ?", (cik, quarter))
+            self._connection.executemany(
+                "INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((cusip, quarter, cik, name, ticker, shares, value) for cusip, name, ticker, shares, value in rows)
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO reports VALUES (?, ?, ?)", (cik, quarter, accession_numbers)
+            )
+
+        return True
+
+    def add_collection(self, collection):
+        """
+        Index the reports of a collection, e.g. after it was built or refreshed.
+
+        Args:
+            collection (report_collection.QuarterlyReportsCollection): The collection of reports of a fund.
+
+        Returns:
+            list: The quarters which were indexed, reports already indexed with the same forms are skipped.
+        """
+        return [quarter for quarter in sorted(collection.reports.keys())
+                if self.add_report(collection.reports[quarter])]
+
+    def holders(self, cusip, quarter):
+        """
+        Return the funds holding a CUSIP in a quarter.
+
+        Args:
+            cusip (str): The CUSIP of the security.
+            quarter (str): The quarter in the format 'YYYY-Q<1-4>'.
+
+        Returns:
+            pandas.DataFrame: One row per fund with the HOLDER_COLUMNS columns, sorted by value in descending order.
+        """
+        return self.holders_range(cusip, quarter, quarter).sort_values(
+            'value', ascending=False, kind='stable', ignore_index=True
+        )
+
+    def holders_range(self, cusip, from_quarter, to_quarter):
+        """
+        Return the funds holding a CUSIP in a range of quarters.
+
+        Args:
+            cusip (str): The CUSIP of the security.
+            from_quarter (str): The first quarter in the format 'YYYY-Q<1-4>'.
+            to_quarter (str): The last quarter in the format 'YYYY-Q<1-4>'.
+
+        Returns:
+            pandas.DataFrame: One row per fund and quarter with the HOLDER_COLUMNS columns, sorted by quarter and
+            cik.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {', '.join(HOLDER_COLUMNS)} FROM positions"
+                " WHERE cusip = ? AND report_quarter BETWEEN ? AND ? ORDER BY report_quarter, cik",
+                (cusip, from_quarter, to_quarter)
+            ).fetchall()
+
+        return pd.DataFrame.from_records(rows, columns=HOLDER_COLUMNS)
+
+    def holder_changes(self, cusip, from_quarter, to_quarter):
+        """
+        Return how the funds holding a CUSIP changed their positions between adjacent quarters of a range.
+
+        Quarters are compared with the previous quarter indexed for any fund, see changes.position_changes().
+
+        Args:
+            cusip (str): The CUSIP of the security.
+            from_quarter (str): The first quarter in the format 'YYYY-Q<1-4>'.
+            to_quarter (str): The last quarter in the format 'YYYY-Q<1-4>'.
+
+        Returns:
+            pandas.DataFrame: One row per fund and pair of adjacent quarters where it held the CUSIP in either
+            quarter, with the cik and changes.CHANGE_COLUMNS columns.
+        """
+        quarters = [quarter for quarter in self.quarters() if from_quarter <= quarter <= to_quarter]
+
+        return changes.position_changes(self.holders_range(cusip, from_quarter, to_quarter), quarters=quarters)
+
+    def quarters(self, cik=None):
+        """
+        Return the indexed quarters, of all funds or of one fund.
+
+        Args:
+            cik (str): The Central Index Key (CIK) of a fund, or None for all funds.
+
+        Returns:
+            list: The quarters in the format 'YYYY-Q<1-4>', in ascending order.
+        """
+        with self._lock:
+            if cik is None:
+                rows = self._connection.execute("SELECT DISTINCT report_quarter FROM reports ORDER BY 1")
+            else:
+                rows = self._connection.execute(
+                    "SELECT report_quarter FROM reports WHERE cik = ? ORDER BY 1", (cik,)
+                )
+            return [row[0] for row in rows]
+
+    def clear(self):
+        """
+        Remove all entries from the index.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM positions")
+            self._connection.execute("DELETE FROM reports")
@@ -0,0 +1,97 @@
+import html
+
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+PAGE_SIZE = 50  # Rows rendered per page
+
+
+def frame_to_html_page(frame, formats, page=0, page_size=PAGE_SIZE, title=None, totals=None):
+    """
+    Render one page of a sorted DataFrame as an HTML table, followed by an 'Other' row and a 'Total' row.
+
+    Only the rows of the page are formatted and escaped, so the size and the rendering time of the HTML do not
+    depend on the number of rows of the frame. The Other row sums the formatted columns over all rows which are
+    not on the page and the Total row over all rows, both with one vectorized sum per column. A caption gives the
+    rows shown and the number of pages, the other pages are rendered by calling again with another page.
+
+    Args:
+        frame (pandas.DataFrame): The rows to render, already sorted, e.g. largest holdings first.
+        formats (dict): A map with the numeric columns as key and their format string as value, e.g. '{:,.0f}'. These
+            columns are summed in the Other and Total rows, the other columns are rendered as escaped strings.
+        page (int): The page to render, starting at 0. Default is 0, the top page_size rows.
+        page_size (int): The number of rows per page. Default is PAGE_SIZE.
+        title (str): A title rendered as <h3> above the table. Default is None.
+        totals (dict): Totals of some of the formatted columns, used instead of their sums, e.g. 100 for a
+            column of rounded percentages. Default is None.
+
+    Returns:
+        str: The HTML of the title and the table.
+
+    Raises:
+        ValueError: If page_size is not positive or page is out of range.
+    """
+    if page_size < 1:
+        raise ValueError("The page_size must be positive.")
+
+    row_count = len(frame)
+    page_count = max(1, -(-row_count // page_size))
+    if not 0 <= page < page_count:
+        raise ValueError(f"Invalid 'page' parameter. Use a page between 0 and {page_count - 1}.")
+
+    start = page * page_size
+    page_frame = frame.iloc[start:start + page_size]
+    columns = list(frame.columns)
+
+    # Column-wise formatting of the page rows only
+    cells = []
+    for column in columns:
+        values = page_frame[column].tolist()
+        if column in formats:
+            cells.append([_format_number(value, formats[column]) for value in values])
+        else:
+            cells.append([_escape(value) for value in values])
+
+    column_totals = {column: frame[column].to_numpy(dtype='float64').sum() for column in formats}
+    column_totals.update(totals or {})
+    page_totals = {column: page_frame[column].to_numpy(dtype='float64').sum() for column in formats}
+    other_count = row_count - len(page_frame)
+
+    lines = [f"<h3>{html.escape(title)}</h3>"] if title else []
+    lines.append('<table class="dataframe">')
+    lines.append(f"<caption>Rows {start + 1 if row_count else 0}-{start + len(page_frame)} of {row_count:,}, "
+                 f"page {page + 1} of {page_count}</caption>")
+    lines.append('<thead><tr>' + ''.join(f"<th>{html.escape(str(column))}</th>" for column in columns)
+                 + '</tr></thead>')
+    lines.append('<tbody>')
+    lines.extend('<tr>' + ''.join(f"<td>{cell}</td>" for cell in row) + '</tr>' for row in zip(*cells))
+    if other_count:
+        other_totals = {column: column_totals[column] - page_totals[column] for column in formats}
+        lines.append(_summary_row(columns, f"Other ({other_count:,} rows)", other_totals, formats))
+    lines.append(_summary_row(columns, 'Total', column_totals, formats))
+    lines.append('</tbody>')
+    lines.append('</table>')
+
+    return '\n'.join(lines)
+
+
+def _summary_row(columns, label, sums, formats):
+    # The label goes in the first column, the sums under their columns and the other columns stay empty
+    cells = [
+        _format_number(sums[column], formats[column]) if column in formats else (label if position == 0 else '')
+        for position, column in enumerate(columns)
+    ]
+    return '<tr style="font-weight: bold">' + ''.join(f"<td>{cell}</td>" for cell in cells) + '</tr>'
+
+
+def _format_number(value, format_string):
+    if pd.isna(value):
+        return ''
+    return format_string.format(value)
+
+
+def _escape(value):
+    if pd.isna(value):
+        return ''
+    return html.escape(str(value))
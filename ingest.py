@@ -0,0 +1,191 @@
+"""
+Bulk ingestion of every form 13F filed in a range of filing dates into a Parquet dataset partitioned by quarter.
+
+The headers of the filing window are listed with /api/v1/filings, grouped by (cik, period_of_report) and every
+group is downloaded and consolidated on a pool of workers with the same semantics as form.consolidate_holdings().
+Each consolidated report is written to its own file:
+
+    <directory>/report_quarter=<YYYY-Q<1-4>>/<cik>_<period_of_report>.parquet
+
+A checkpoint file in the directory records the reports written, so an interrupted run is resumed by running it
+again with the same directory: reports already written with the same forms are skipped.
+
+Usage:
+    python ingest.py 2024-04-01 2024-06-30 --directory holdings --workers 8
+
+The dataset can be read back with pandas.read_parquet(directory).
+"""
+import argparse
+import json
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+import form
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+CHECKPOINT_FILE = '_checkpoint.json'
+DATASET_COLUMNS = ['cik', 'company_name', 'period_of_report'] + [
+    column for column in form.HOLDING_COLUMNS if column != 'cik'
+]
+
+
+class BulkIngestion:
+    """
+    A class to represent the ingestion of all forms 13F filed in a range of filing dates into a Parquet dataset.
+
+    A window often contains amendments of reports whose original form was filed before the window. For such
+    (cik, period_of_report) groups the whole chain of forms of the period is listed with get_form_headers(), so
+    that the amendments are applied to the original form as in consolidate_holdings().
+
+    Attributes:
+        directory (str): The directory of the dataset and of its checkpoint file.
+        from_date (str): The first filing date in the format 'YYYY-MM-DD'.
+        to_date (str): The last filing date in the format 'YYYY-MM-DD'.
+        max_workers (int): The number of reports downloaded and consolidated at the same time.
+        completed (dict): A map with '<cik>_<period_of_report>' as key and the sorted accession numbers of the
+            forms of the written report as value, loaded from and saved to the checkpoint file.
+        failures (dict): A map with '<cik>_<period_of_report>' as key and the exception as value for the reports
+            which could not be ingested in the last run.
+
+    Methods:
+        __init__(directory, from_date, to_date, max_workers):
+            Initializes the BulkIngestion object and loads the checkpoint file of the directory if any.
+
+        run(progress):
+            Ingests the reports of the window which are not written yet.
+    """
+
+    def __init__(self, directory, from_date, to_date, max_workers=8):
+        self.directory = directory
+        self.from_date = str(from_date)
+        self.to_date = str(to_date)
+        self.max_workers = max_workers
+        self.completed = {}
+        self.failures = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        checkpoint_path = os.path.join(self.directory, CHECKPOINT_FILE)
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint_file:
+                self.completed = json.load(checkpoint_file)['completed']
+
+    def run(self, progress=None):
+        """
+        Ingest every report of the filing window which is not in the checkpoint yet.
+
+        Args:
+            progress (callable): Called with (report_key, reports_done, reports_total) after every report, e.g. to
+                print the progress. Default is None.
+
+        Returns:
+            dict: The number of reports 'written', 'skipped' because already written and 'failed'.
+        """
+        self.failures = {}
+        headers_by_report = defaultdict(list)
+        for header in form.get_filing_headers(self.from_date, self.to_date):
+            headers_by_report[(header.cik, str(header.period_of_report))].append(header)
+
+        pending = {}
+        skipped = 0
+        for (cik, period_of_report), headers in headers_by_report.items():
+            key = f"{cik}_{period_of_report}"
+            accession_numbers = self.completed.get(key)
+            if accession_numbers is not None and set(header.accession_number for header in headers) <= set(
+                    accession_numbers):
+                skipped += 1
+            else:
+                pending[key] = (cik, period_of_report, headers)
+
+        written = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._ingest_report, *report): key for key, report in pending.items()}
+            for reports_done, future in enumerate(as_completed(futures), start=1):
+                key = futures[future]
+                try:
+                    accession_numbers = future.result()
+                except Exception as error:
+                    self.failures[key] = error
+                else:
+                    self._save_checkpoint(key, accession_numbers)
+                    written += 1
+                if progress is not None:
+                    progress(key, reports_done, len(pending))
+
+        return {'written': written, 'skipped': skipped, 'failed': len(self.failures)}
+
+    def _ingest_report(self, cik, period_of_report, headers):
+        """
+        Download, consolidate and write the report of a (cik, period_of_report). Returns its accession numbers.
+        """
+        # Amendments filed in the window need the forms filed before it, e.g. the original 13F-HR
+        if any(header.is_amendment is None for header in headers):
+            report_headers = headers
+        else:
+            report_headers = form.get_form_headers(cik, period_of_report, period_of_report, cached=False)
+
+        # Pages of a report are requested one at a time, the pool already runs max_workers reports
+        forms = form.get_forms_for_headers(report_headers, max_workers=1)
+        holdings_table = form.consolidate_holdings_table(forms)
+
+        latest_header = forms[-1].header
+        dataset_table = holdings_table.assign(
+            company_name=latest_header.company_name,
+            period_of_report=period_of_report
+        )[DATASET_COLUMNS]
+        # Plain string columns keep the same Parquet schema in every file, also when a column is all null
+        dataset_table = dataset_table.astype({
+            column: 'string' for column in DATASET_COLUMNS if column not in form.SUMMED_COLUMNS
+        })
+
+        partition = os.path.join(self.directory, f"report_quarter={period_to_quarter(period_of_report)}")
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, f"{cik}_{period_of_report}.parquet")
+        dataset_table.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+        return sorted(header.accession_number for header in report_headers)
+
+    def _save_checkpoint(self, key, accession_numbers):
+        # Written to a temporary file first, so that a crash never leaves a truncated checkpoint
+        with self._lock:
+            self.completed[key] = accession_numbers
+            checkpoint_path = os.path.join(self.directory, CHECKPOINT_FILE)
+            with open(checkpoint_path + '.tmp', 'w') as checkpoint_file:
+                json.dump({'from_date': self.from_date, 'to_date': self.to_date, 'completed': self.completed},
+                          checkpoint_file)
+            os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+
+def period_to_quarter(period_of_report):
+    """
+    Convert a period of report date to the quarter it ends, the inverse of report.quarter_to_period_of_report().
+
+    Args:
+        period_of_report (str): The period of report date in the format 'YYYY-MM-DD'.
+
+    Returns:
+        str: The quarter in the format 'YYYY-Q<1-4>'.
+    """
+    period = date.fromisoformat(str(period_of_report))
+    return f"{period.year}-Q{(period.month - 1) // 3 + 1}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest all forms 13F filed in a date range into Parquet.")
+    parser.add_argument('from_date', help="first filing date, YYYY-MM-DD")
+    parser.add_argument('to_date', help="last filing date, YYYY-MM-DD")
+    parser.add_argument('--directory', default='holdings', help="directory of the Parquet dataset")
+    parser.add_argument('--workers', type=int, default=8, help="number of reports ingested at the same time")
+    args = parser.parse_args()
+
+    ingestion = BulkIngestion(args.directory, args.from_date, args.to_date, max_workers=args.workers)
+    counts = ingestion.run(progress=lambda key, done, total: print(f"{done}/{total} {key}", flush=True))
+    print(f"{counts['written']} written, {counts['skipped']} skipped, {counts['failed']} failed")
+    for key, error in ingestion.failures.items():
+        print(f"{key}: {error!r}")
@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf')]  # Upper bounds, seconds
+
+
+class ApiStats:
+    """
+    A class to collect statistics on API requests and processing stages.
+
+    Two levels of API activity are recorded per endpoint path, e.g. '/api/v1/form':
+    calls made by this package, which include the backoff sleeps and retries of the client, and the individual
+    HTTP requests sent by the client, from which the bytes received and the 429 responses are counted.
+    The difference between call and HTTP seconds is the time spent in backoff sleeps and deserialization.
+
+    Hooks are called with an event dict for every recorded call, HTTP request and stage.
+
+    Attributes:
+        hooks (list): Callables receiving each event dict, with a 'type' of 'call', 'http' or 'stage'.
+
+    Methods:
+        record_call(endpoint, seconds, error):
+            Records a call to an endpoint.
+
+        record_http(url, status, bytes_received, seconds):
+            Records an HTTP request sent by the client.
+
+        stage(name):
+            Context manager recording the time spent in a processing stage.
+
+        record_stage(name, seconds):
+            Records the time spent in a processing stage.
+
+        add_hook(hook):
+            Registers a callable receiving each event.
+
+        to_dict():
+            Returns the statistics as a dict.
+
+        to_json(path):
+            Returns the statistics as JSON, also written to path if given.
+
+        reset():
+            Clears all statistics.
+    """
+
+    def __init__(self):
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._calls = defaultdict(_new_latency_stats)
+            self._http = defaultdict(lambda: dict(_new_latency_stats(), bytes=0, retries=0, statuses=defaultdict(int)))
+            self._stages = defaultdict(lambda: {'count': 0, 'seconds': 0.0})
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def record_call(self, endpoint, seconds, error=None):
+        with self._lock:
+            call = self._calls[endpoint]
+            _add_latency(call, seconds)
+            if error is not None:
+                call['errors'] += 1
+        self._notify(type='call', endpoint=endpoint, seconds=seconds, error=None if error is None else repr(error))
+
+    def record_http(self, url, status, bytes_received, seconds):
+        endpoint = urlparse(url).path
+        with self._lock:
+            http = self._http[endpoint]
+            _add_latency(http, seconds)
+            http['bytes'] += bytes_received
+            http['statuses'][str(status)] += 1
+            if status == 429:
+                http['retries'] += 1
+            elif status is None:
+                http['errors'] += 1
+        self._notify(type='http', endpoint=endpoint, status=status, bytes=bytes_received, seconds=seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_stage(self, name, seconds):
+        with self._lock:
+            self._stages[name]['count'] += 1
+            self._stages[name]['seconds'] += seconds
+        self._notify(type='stage', stage=name, seconds=seconds)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'calls': {endpoint: _export(call) for endpoint, call in self._calls.items()},
+                'http': {endpoint: _export(http) for endpoint, http in self._http.items()},
+                'stages': {name: dict(stage) for name, stage in self._stages.items()},
+            }
+
+    def to_json(self, path=None):
+        stats_json = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, 'w') as json_file:
+                json_file.write(stats_json)
+        return stats_json
+
+    def _notify(self, **event):
+        for hook in self.hooks:
+            hook(event)
+
+
+def instrument_client(api_client, api_stats):
+    """
+    Record every HTTP request sent by an SDK api client, including the retries after 429 responses.
+
+    Args:
+        api_client (forms13f.ApiClient): The client whose rest_client.request is wrapped.
+        api_stats (ApiStats): The statistics the requests are recorded in.
+    """
+    rest_client = getattr(api_client, 'rest_client', None)
+    if rest_client is None or not hasattr(rest_client, 'request'):
+        return
+
+    request = rest_client.request
+
+    def instrumented_request(method, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = request(method, url, *args, **kwargs)
+        except Exception:
+            api_stats.record_http(url, None, 0, time.perf_counter() - start)
+            raise
+
+        # The generated RESTResponse keeps the body once read, so the client can read it again
+        data = response.read() if hasattr(response, 'read') else getattr(response, 'data', None)
+        api_stats.record_http(url, getattr(response, 'status', None), len(data or b''), time.perf_counter() - start)
+        return response
+
+    rest_client.request = instrumented_request
+
+
+def _new_latency_stats():
+    return {'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'histogram': [0] * len(LATENCY_BUCKETS)}
+
+
+def _add_latency(latency_stats, seconds):
+    latency_stats['count'] += 1
+    latency_stats['seconds'] += seconds
+    latency_stats['max_seconds'] = max(latency_stats['max_seconds'], seconds)
+    bucket = next(index for index, upper_bound in enumerate(LATENCY_BUCKETS) if seconds <= upper_bound)
+    latency_stats['histogram'][bucket] += 1
+
+
+def _export(latency_stats):
+    exported = dict(latency_stats)
+    exported['histogram'] = {
+        f"<={upper_bound}": count for upper_bound, count in zip(LATENCY_BUCKETS, latency_stats['histogram'])
+    }
+    if 'statuses' in exported:
+        exported['statuses'] = dict(exported['statuses'])
+    return exported
@@ -0,0 +1,35 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    A class to represent a module which is only imported when one of its attributes is first accessed.
+
+    Modules such as pandas, numpy and IPython take a significant time to import. Importing them lazily lets
+    batch workers and scripts which never build a DataFrame or render a report start without paying for them.
+
+    Attributes:
+        name (str): The absolute name of the module, e.g. 'pandas'.
+
+    Methods:
+        __init__(name):
+            Initializes the LazyModule object without importing the module.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            # importlib serializes concurrent imports of the same module, the lock avoids importing it twice
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self.name)
+
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        return f"<LazyModule '{self.name}' ({'imported' if self._module is not None else 'not imported'})>"
@@ -0,0 +1,206 @@
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+import cache
+import form
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+
+NAME_INDEX_TTL = 7 * 24 * 60 * 60  # Seconds before a persisted index is crawled again
+NGRAM_SIZE = 3
+MIN_SIMILARITY = 0.3  # Minimum trigram similarity of a fuzzy match
+
+
+class FundNameIndex:
+    """
+    A class to represent a local search index of the current and historical names of all filers.
+
+    The index is built from a paginated /api/v1/filers crawl, filers listed without names are completed with
+    /api/v1/filer. It is persisted as compressed JSON and crawled again when older than max_age seconds, so
+    lookups need no network. Names are normalized to lowercase words and indexed by character trigrams: a
+    substring query only verifies the names sharing all of its trigrams, and a fuzzy query ranks names by the
+    similarity of their trigrams.
+
+    Attributes:
+        path (str): The path of the persisted index.
+        max_age (int): Number of seconds the persisted index stays valid.
+        built_at (float): The time the index was crawled, in seconds since the epoch, or None if not built yet.
+
+    Methods:
+        __init__(path, max_age):
+            Initializes the FundNameIndex object and loads the persisted index if it is recent enough.
+
+        refresh():
+            Crawls the names of all filers again and persists the index.
+
+        search(name, limit, fuzzy):
+            Returns the best matching filers as a ranked list of (cik, name, score) tuples.
+
+        get_ciks(name, limit, fuzzy):
+            Returns the CIKs of the best matching filers.
+    """
+
+    def __init__(self, path=None, max_age=NAME_INDEX_TTL):
+        self.path = path or os.path.join(cache.DEFAULT_CACHE_DIR, 'fund_names.json.gz')
+        self.max_age = max_age
+        self.built_at = None
+        self._names = []  # (cik, name, normalized name)
+        self._ngrams = {}  # trigram -> array of the positions in _names of the names containing it
+        self._ngram_counts = np.zeros(0, dtype='int64')  # number of distinct trigrams of each name
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            with gzip.open(self.path, 'rt', encoding='utf-8') as index_file:
+                persisted = json.load(index_file)
+            if time.time() - persisted['built_at'] < self.max_age:
+                self._build(persisted['filers'], persisted['built_at'])
+
+    def refresh(self):
+        """
+        Crawl the current and historical names of all filers and persist the index.
+        """
+        filers = []
+        offset = 0
+        while True:
+            page = form._call_api('/api/v1/filers', form.get_api_instance().api_v1_filers_get, offset=offset,
+                                  limit=form.PAGE_LIMIT) or []
+            filers.extend([filer.cik, list(filer.company_names or [])] for filer in page)
+            if len(page) < form.PAGE_LIMIT:
+                break
+            offset += form.PAGE_LIMIT
+
+        # Historical names of filers listed without any
+        for filer in filers:
+            if not filer[1]:
+                details = form._call_api('/api/v1/filer', form.get_api_instance().api_v1_filer_get, filer[0])
+                filer[1] = list(details.company_names or []) if details is not None else []
+
+        built_at = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with gzip.open(self.path + '.tmp', 'wt', encoding='utf-8') as index_file:
+            json.dump({'built_at': built_at, 'filers': filers}, index_file)
+        os.replace(self.path + '.tmp', self.path)
+
+        self._build(filers, built_at)
+
+    def search(self, name, limit=10, fuzzy=True):
+        """
+        Return the filers whose current or historical names best match a name.
+
+        Names containing the normalized query come first, ranked by how early the match starts and by length,
+        so that 'berkshire' ranks 'BERKSHIRE HATHAWAY INC' before 'NEW BERKSHIRE CAPITAL LLC'. If fuzzy is True,
+        the remaining places are filled with the names sharing the most trigrams with the query, which tolerates
+        typos and missing words. Each filer is returned once, with its best matching name.
+
+        Args:
+            name (str): The name or part of the name to search for, case-insensitive.
+            limit (int): The maximum number of filers returned. Default is 10.
+            fuzzy (bool): Whether to add approximate matches after the substring matches. Default is True.
+
+        Returns:
+            list: (cik, name, score) tuples sorted by score in descending order, substring matches have a score
+            above 1 and fuzzy matches a score between 0 and 1.
+        """
+        self._ensure_built()
+        query = _normalize(name)
+        if not query:
+            return []
+
+        scores = {}
+
+        # Substring matches: names containing all inner trigrams of the query, verified with a substring test
+        inner_ngrams = {query[start:start + NGRAM_SIZE] for start in range(len(query) - NGRAM_SIZE + 1)}
+        if inner_ngrams:
+            candidates = np.flatnonzero(self._count_shared(inner_ngrams) == len(inner_ngrams)).tolist()
+        else:
+            candidates = range(len(self._names))
+        for position in candidates:
+            normalized = self._names[position][2]
+            start = normalized.find(query)
+            if start >= 0:
+                scores[position] = 2 - start / (len(normalized) + 1) - len(normalized) / 10000
+
+        # Fuzzy matches: Dice similarity of the trigram sets, at least MIN_SIMILARITY
+        if fuzzy and len(scores) < limit:
+            query_ngrams = _ngrams(query)
+            similarity = 2 * self._count_shared(query_ngrams) / (len(query_ngrams) + self._ngram_counts)
+            similarity[list(scores)] = 0
+            # A few more than limit, some of them may be other names of the same filers
+            best = np.argpartition(-similarity, min(4 * limit, len(similarity)) - 1)[:4 * limit]
+            for position in best[similarity[best] >= MIN_SIMILARITY].tolist():
+                scores[position] = float(similarity[position])
+
+        results = []
+        seen_ciks = set()
+        for position in sorted(scores, key=lambda position: (-scores[position], position)):
+            cik, company_name, _ = self._names[position]
+            if cik not in seen_ciks:
+                seen_ciks.add(cik)
+                results.append((cik, company_name, round(scores[position], 4)))
+                if len(results) == limit:
+                    break
+
+        return results
+
+    def get_ciks(self, name, limit=10, fuzzy=True):
+        """
+        Return the CIKs of the filers whose names best match a name, see search().
+
+        Args:
+            name (str): The name or part of the name to search for, case-insensitive.
+            limit (int): The maximum number of CIKs returned. Default is 10.
+            fuzzy (bool): Whether to add approximate matches after the substring matches. Default is True.
+
+        Returns:
+            list: The CIKs, best match first.
+        """
+        return [cik for cik, _, _ in self.search(name, limit, fuzzy)]
+
+    def _ensure_built(self):
+        with self._lock:
+            if self.built_at is None or time.time() - self.built_at >= self.max_age:
+                self.refresh()
+
+    def _count_shared(self, ngrams):
+        # Number of the given trigrams contained in each name, counted in one pass over their postings
+        postings = [self._ngrams[ngram] for ngram in ngrams if ngram in self._ngrams]
+        if not postings:
+            return np.zeros(len(self._names), dtype='int64')
+
+        return np.bincount(np.concatenate(postings), minlength=len(self._names))
+
+    def _build(self, filers, built_at):
+        names = []
+        ngrams = defaultdict(list)
+        ngram_counts = []
+        for cik, company_names in filers:
+            for company_name in dict.fromkeys(company_names):
+                normalized = _normalize(company_name)
+                if normalized:
+                    name_ngrams = _ngrams(normalized)
+                    for ngram in name_ngrams:
+                        ngrams[ngram].append(len(names))
+                    names.append((cik, company_name, normalized))
+                    ngram_counts.append(len(name_ngrams))
+
+        self._names = names
+        self._ngrams = {ngram: np.fromiter(positions, dtype='int32') for ngram, positions in ngrams.items()}
+        self._ngram_counts = np.asarray(ngram_counts, dtype='int64')
+        self.built_at = built_at
+
+
+def _normalize(name):
+    # Lowercase words separated by single spaces, punctuation such as '&', ',' and '.' is dropped
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', (name or '').lower()).split())
+
+
+def _ngrams(normalized):
+    # Padded, so that words shorter than NGRAM_SIZE and word starts also produce trigrams
+    padded = f" {normalized} "
+    return {padded[start:start + NGRAM_SIZE] for start in range(len(padded) - NGRAM_SIZE + 1)}
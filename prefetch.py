@@ -0,0 +1,165 @@
+import queue
+import threading
+from collections import OrderedDict
+
+PREFETCH_QUEUE_SIZE = 8  # Keys waiting to be fetched, further keys are dropped
+PREFETCH_CACHE_SIZE = 16  # Results kept, the least recently used ones are evicted
+PREFETCH_WORKERS = 2
+
+
+class Prefetcher:
+    """
+    A class to represent a background prefetcher which fetches values by key on daemon threads and keeps them in
+    an in-memory LRU.
+
+    Keys are scheduled in a bounded queue: when it is full, further keys are dropped rather than delaying the
+    caller. A scheduled key is cancelled when its value is already in the LRU when a worker picks it up, or when
+    it is requested with get() before a worker picked it up, the caller then fetches it itself. A key being
+    fetched when it is requested is waited for, so it is never fetched twice. Failed fetches are not kept, the
+    caller fetching the value again gets the error.
+
+    Attributes:
+        fetch (callable): Called with a key on a worker thread, returns the value to keep.
+        max_results (int): The maximum number of values kept.
+        hits (int): The number of get() calls answered by the prefetcher.
+        misses (int): The number of get() calls which found nothing.
+        cancelled (int): The number of scheduled keys which were not fetched.
+        dropped (int): The number of keys not scheduled because the queue was full.
+
+    Methods:
+        __init__(fetch, max_pending, max_results, max_workers):
+            Initializes the Prefetcher object and starts its worker threads.
+
+        schedule(key):
+            Queues a key to be fetched in the background. Returns whether it was queued.
+
+        get(key, wait):
+            Returns the value of a key if it was prefetched, waiting for it if it is being fetched, or None.
+
+        close(wait):
+            Cancels the queued keys and stops the worker threads.
+    """
+
+    def __init__(self, fetch, max_pending=PREFETCH_QUEUE_SIZE, max_results=PREFETCH_CACHE_SIZE,
+                 max_workers=PREFETCH_WORKERS):
+        self.fetch = fetch
+        self.max_results = max_results
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._queued = set()
+        self._running = {}  # key -> threading.Event set when the fetch is done
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(max_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def schedule(self, key):
+        """
+        Queue a key to be fetched in the background, unless it is already kept, queued or being fetched.
+
+        Args:
+            key (hashable): The key passed to fetch.
+
+        Returns:
+            bool: True if the key was queued, False otherwise.
+        """
+        with self._lock:
+            if key in self._results or key in self._queued or key in self._running:
+                return False
+            try:
+                self._queue.put_nowait(key)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._queued.add(key)
+
+        return True
+
+    def get(self, key, wait=True):
+        """
+        Return the prefetched value of a key.
+
+        Args:
+            key (hashable): The key passed to fetch.
+            wait (bool): Whether to wait for the value if the key is being fetched. Default is True.
+
+        Returns:
+            object: The value, or None if the key was not prefetched. A queued key is cancelled.
+        """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key]
+            if key in self._queued:
+                # The caller fetches it now, the worker skips it
+                self._queued.discard(key)
+                self.cancelled += 1
+            done = self._running.get(key) if wait else None
+            if done is None:
+                self.misses += 1
+                return None
+
+        done.wait()
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                return self._results[key]
+            self.misses += 1
+            return None
+
+    def close(self, wait=False):
+        """
+        Cancel the queued keys and stop the worker threads once the keys being fetched are done.
+
+        Args:
+            wait (bool): Whether to wait for the keys being fetched. Default is False, the worker threads then
+                stop in the background.
+        """
+        with self._lock:
+            self.cancelled += len(self._queued)
+            self._queued.clear()
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _work(self):
+        while True:
+            key = self._queue.get()
+            if key is None:
+                return
+
+            with self._lock:
+                if key not in self._queued or key in self._results:
+                    # Requested in the meantime, or already kept
+                    self._queued.discard(key)
+                    self.cancelled += 1
+                    continue
+                self._queued.discard(key)
+                done = self._running[key] = threading.Event()
+
+            try:
+                value = self.fetch(key)
+            except Exception:
+                value = None
+
+            with self._lock:
+                if value is not None:
+                    self._results[key] = value
+                    self._results.move_to_end(key)
+                    while len(self._results) > self.max_results:
+                        self._results.popitem(last=False)
+                del self._running[key]
+            done.set()
@@ -0,0 +1,75 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A class to represent a thread-safe token bucket limiting the rate of API requests.
+
+    The bucket holds up to burst tokens and is refilled at rate tokens per second. Every request takes one token.
+    When the bucket is empty, the token is reserved and the caller sleeps until it is refilled, so concurrent
+    callers are spread evenly over time instead of all retrying at once.
+
+    Attributes:
+        rate (float): The sustained number of requests per second.
+        burst (int): The maximum number of requests sent back to back after an idle period.
+
+    Methods:
+        __init__(rate, burst):
+            Initializes the TokenBucket object, full.
+
+        acquire():
+            Takes a token, sleeping until one is available. Returns the seconds slept.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("The rate must be positive.")
+
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # The token is reserved now, a negative count is the queue of callers waiting for the refill
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def limit_client(api_client, get_bucket, api_stats=None):
+    """
+    Take a token from a bucket before every HTTP request sent by an SDK api client, including the retries.
+
+    Args:
+        api_client (forms13f.ApiClient): The client whose rest_client.request is wrapped.
+        get_bucket (callable): Returns the TokenBucket to use, or None to send the request without limit. It is
+            called for every request, so the limit can be changed without rebuilding the client.
+        api_stats (instrumentation.ApiStats): If given, the time spent waiting for a token is recorded in its
+            'rate_limit' stage.
+    """
+    rest_client = getattr(api_client, 'rest_client', None)
+    if rest_client is None or not hasattr(rest_client, 'request'):
+        return
+
+    request = rest_client.request
+
+    def limited_request(method, url, *args, **kwargs):
+        bucket = get_bucket()
+        if bucket is not None:
+            wait = bucket.acquire()
+            if wait > 0 and api_stats is not None:
+                api_stats.record_stage('rate_limit', wait)
+
+        return request(method, url, *args, **kwargs)
+
+    rest_client.request = limited_request
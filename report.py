@@ -1,10 +1,25 @@
+import sys
 from datetime import date
 from typing import List, Optional
 from form import *
 import forms13f
-import pandas as pd
-import numpy as np
-from IPython.display import display_html
+import html_table
+import prefetch
+import snapshot
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+
+# Formats of the numeric columns of get_holdings_frame() in HTML
+HOLDINGS_FORMATS = {'Value, $k': '{:,.0f}', 'Shares': '{:,.0f}', '%': '{:.2f}'}
+
+# Background prefetcher of the forms of adjacent quarters, enabled with enable_prefetch()
+prefetcher = None
+prefetch_distance = 1
+
+# Attributes of ReportHeader holding a date, besides the list of filing_dates
+HEADER_DATE_FIELDS = ['period_of_report', 'date_as_of_change', 'effectiveness_date']
 
 
 class ReportHeader:
@@ -32,6 +47,7 @@ class ReportHeader:
         business_phone (str): Business phone number of the company.
         table_value_total (int): Total value in the table.
         table_entry_total (int): Total number of entries in the table.
+        quarter_key (int): report_quarter as an integer, see quarter_to_key().
 
     Methods:
         __init__(urls, accession_numbers, submission_type, public_document_count, period_of_report, report_quarter,
@@ -42,7 +58,23 @@ class ReportHeader:
 
         display_as_html():
             Displays the header information as an HTML header.
+
+        to_html():
+            Returns the HTML header without displaying it.
+
+        to_dict():
+            Returns the attributes as a JSON serializable dict, dates as ISO strings.
+
+        from_dict(header_dict):
+            Class method creating a ReportHeader from the dict returned by to_dict().
     """
+    # Headers of hundreds of funds over many quarters are kept in memory, slots avoid a dict per header
+    __slots__ = (
+        'urls', 'accession_numbers', 'submission_type', 'public_document_count', 'period_of_report',
+        'report_quarter', 'filing_dates', 'date_as_of_change', 'effectiveness_date', 'cik', 'company_name',
+        'irs_number', 'state_of_incorporation', 'fiscal_year_end', 'form_type', 'sec_act', 'business_address',
+        'business_phone', 'table_value_total', 'table_entry_total', 'quarter_key'
+    )
 
     def __init__(self, urls, accession_numbers, submission_type, public_document_count,
                  period_of_report, report_quarter, filing_dates, date_as_of_change,
@@ -51,24 +83,25 @@ class ReportHeader:
                  business_phone, table_value_total, table_entry_total):
         self.urls = urls
         self.accession_numbers = accession_numbers
-        self.submission_type = submission_type
+        self.submission_type = _intern(submission_type)
         self.public_document_count = public_document_count
         self.period_of_report = period_of_report
-        self.report_quarter = report_quarter
+        self.report_quarter = _intern(report_quarter)
         self.filing_dates = filing_dates
         self.date_as_of_change = date_as_of_change
         self.effectiveness_date = effectiveness_date
-        self.cik = cik
-        self.company_name = company_name
+        self.cik = _intern(cik)
+        self.company_name = _intern(company_name)
         self.irs_number = irs_number
-        self.state_of_incorporation = state_of_incorporation
-        self.fiscal_year_end = fiscal_year_end
-        self.form_type = form_type
-        self.sec_act = sec_act
+        self.state_of_incorporation = _intern(state_of_incorporation)
+        self.fiscal_year_end = _intern(fiscal_year_end)
+        self.form_type = _intern(form_type)
+        self.sec_act = _intern(sec_act)
         self.business_address = business_address
         self.business_phone = business_phone
         self.table_value_total = table_value_total
         self.table_entry_total = table_entry_total
+        self.quarter_key = quarter_to_key(report_quarter)
 
     def display_as_html(self):
         """
@@ -80,8 +113,16 @@ class ReportHeader:
         Returns:
             None
         """
+        from IPython.display import display_html
+
+        display_html(self.to_html(), raw=True)
+
+    def to_html(self):
         """
-        This method takes the header information of the quarter report and displays it as an HTML header.
+        Return the header information of the quarter report as an HTML header, without displaying it.
+
+        Returns:
+            str: The HTML header.
         """
         # Extract header information
         quarter = self.report_quarter
@@ -103,7 +144,39 @@ class ReportHeader:
             Holdings: {holdings}<br>
             Value: ${value_k:,}k</p>
             """
-        display_html(header_html, raw=True)
+        return header_html
+
+    def to_dict(self):
+        """
+        Return the attributes of the header as a JSON serializable dict, e.g. to store it in a snapshot.
+
+        Returns:
+            dict: The arguments of __init__(), the dates in the format 'YYYY-MM-DD'.
+        """
+        header_dict = {name: getattr(self, name) for name in self.__slots__ if name != 'quarter_key'}
+        header_dict['filing_dates'] = [_date_to_str(filing_date) for filing_date in self.filing_dates]
+        for name in HEADER_DATE_FIELDS:
+            header_dict[name] = _date_to_str(header_dict[name])
+
+        return header_dict
+
+    @classmethod
+    def from_dict(cls, header_dict):
+        """
+        Create a ReportHeader from the dict returned by to_dict().
+
+        Args:
+            header_dict (dict): The attributes of the header, the dates in the format 'YYYY-MM-DD'.
+
+        Returns:
+            ReportHeader: The header.
+        """
+        header_dict = dict(header_dict)
+        header_dict['filing_dates'] = [_str_to_date(filing_date) for filing_date in header_dict['filing_dates']]
+        for name in HEADER_DATE_FIELDS:
+            header_dict[name] = _str_to_date(header_dict[name])
+
+        return cls(**header_dict)
 
 
 class QuarterReport:
@@ -114,13 +187,17 @@ class QuarterReport:
         quarter (str): The quarter of the report in the format 'YYYY-Q<1-4>'.
         cik (str): Central Index Key (CIK) of the company.
         header (ReportHeader): The header information of the quarter report.
-        holdings (list): A list of holdings associated with the quarter report.
+        forms (list): The Form objects of the quarter report sorted by filed_as_of_date.
+        holdings_table (pandas.DataFrame): The consolidated holdings of the quarter report, one row per CUSIP.
+        holdings (list): The consolidated holdings as ApiV1FormEntry objects, built from holdings_table on access.
 
     Methods:
-        __init__(quarter, cik):
-            Initializes the QuarterReport object with the provided quarter and CIK.
+        __init__(quarter, cik, forms):
+            Initializes the QuarterReport object with the provided quarter and CIK. The forms of the quarter
+            sorted by filed_as_of_date can be passed in, e.g. from get_forms_for_range(), instead of being
+            retrieved from the API.
 
-        _get_quarter_report():
+        _get_quarter_report(forms):
             Retrieves and consolidates the quarter report data for the given CIK and quarter.
 
         display_header_as_html():
@@ -128,25 +205,55 @@ class QuarterReport:
 
         display_holdings_as_html():
             Displays the holdings of the quarter report as an HTML table.
+
+        get_holdings_html(page, page_size):
+            Returns one page of the holdings as the HTML table displayed, without rendering it.
+
+        get_holdings_frame():
+            Returns the holdings of the quarter report as displayed, without rendering them.
+
+        save(path):
+            Writes the header and the holdings of the quarter report to an Arrow IPC file.
+
+        load(path, quarter):
+            Class method memory-mapping a quarter report from a file written by save().
     """
-    def __init__(self, quarter, cik):
+    def __init__(self, quarter, cik, forms=None):
         self.quarter = quarter
         self.cik = cik
         self.header = None
-        self.holdings = None
-        self._get_quarter_report()
+        self.forms = []
+        self.holdings_table = None
+        self._get_quarter_report(forms)
 
-    def _get_quarter_report(self):
-        # Convert the quarter to the period of form
-        period_of_report = quarter_to_period_of_report(self.quarter)
+    @property
+    def holdings(self):
+        return table_to_holdings(self.holdings_table)
 
-        # Get the forms for the given CIK and period of form
-        forms = get_forms_for_period(self.cik, period_of_report)
-        if not forms:
-            return
+    def _get_quarter_report(self, forms=None):
+        on_demand = forms is None
+        if on_demand and prefetcher is not None:
+            # Forms prefetched when an adjacent quarter was built
+            forms = prefetcher.get((self.cik, self.quarter))
+
+        if forms is None:
+            # Get the forms for the given CIK and period of form
+            with api_stats.stage('get_forms'):
+                forms = _get_forms_for_quarter((self.cik, self.quarter))
+        if forms:
+            self._consolidate(forms)
+
+        # Only once the report is built, so that the prefetch does not compete with it for the rate limit
+        if on_demand:
+            schedule_adjacent_quarters(self.cik, self.quarter)
+
+    def _consolidate(self, forms):
+
+        self.forms = forms
 
         # Aggregate the holdings from the forms
-        self.holdings = consolidate_holdings(forms)
+        with api_stats.stage('consolidate'):
+            self.holdings_table = consolidate_holdings_table(forms)
 
         # Create the header
         urls = [form.header.url for form in forms]
@@ -184,12 +291,17 @@ class QuarterReport:
         if self.header:
             self.header.display_as_html()
 
-    def display_holdings(self, output="native"):
+    def display_holdings(self, output="native", page=0, page_size=html_table.PAGE_SIZE):
         """
-        This method takes the list of holdings (ApiV1FormEntry objects) and displays them as an HTML table or native DataFrame.
+        This method takes the holdings table and displays it as an HTML table or native DataFrame.
+
+        The HTML table only renders one page of holdings, largest first, followed by the total of the other
+        holdings and the total of the report, see get_holdings_html().
 
         Args:
-            output (str): Determines whether to display as 'as_html' or 'native'. Default is 'as_html'.
+            output (str): Determines whether to display as 'as_html' or 'native'. Default is 'native'.
+            page (int): The page of holdings displayed as HTML, starting at 0. Default is 0.
+            page_size (int): The number of holdings per HTML page. Default is html_table.PAGE_SIZE.
 
         Raises:
             ValueError: If the 'output' parameter is not one of 'as_html' or 'native'.
@@ -197,42 +309,225 @@ class QuarterReport:
         if output not in ["as_html", "native"]:
             raise ValueError("Invalid 'output' parameter. Use 'as_html' or 'native'.")
 
-        if not self.holdings:
+        df_holdings = self.get_holdings_frame()
+        if df_holdings.empty:
             return
 
-        # Extract relevant fields from holdings
-        holdings_data = [
-            {
-                'Name': holding.name_of_issuer,
-                'Symbol': holding.ticker,
-                'CUSIP': holding.cusip,
-                'Value, $k': int(holding.value / 1000),  # Convert value to float and divide by 1000
-                'Shares': holding.ssh_prnamt
-            }
-            for holding in self.holdings
-        ]
-
-        # Create DataFrame
-        df_holdings = pd.DataFrame(holdings_data)
+        # IPython is only imported when rendering
+        from IPython.display import display, display_html
+
+        with api_stats.stage('render'):
+            if output == "as_html":
+                display_html(self.get_holdings_html(page, page_size, df_holdings), raw=True)
+            else:
+                display(df_holdings)
+
+    def get_holdings_html(self, page=0, page_size=html_table.PAGE_SIZE, df_holdings=None):
+        """
+        Return one page of the holdings as the HTML table displayed by display_holdings(), without rendering it.
+
+        Args:
+            page (int): The page of holdings, starting at 0. Default is 0, the largest holdings.
+            page_size (int): The number of holdings per page. Default is html_table.PAGE_SIZE.
+            df_holdings (pandas.DataFrame): The frame returned by get_holdings_frame(), if already built.
+
+        Returns:
+            str: The HTML table of the page with the Other and Total rows.
+
+        Raises:
+            ValueError: If page is out of range.
+        """
+        if df_holdings is None:
+            df_holdings = self.get_holdings_frame()
+
+        # The percentages are rounded, their sum is not exactly 100
+        return html_table.frame_to_html_page(df_holdings, HOLDINGS_FORMATS, page, page_size, totals={'%': 100.0})
+
+    def get_holdings_frame(self):
+        """
+        Return the holdings table as displayed by display_holdings(), without rendering it.
+
+        Returns:
+            pandas.DataFrame: The Name, Symbol, CUSIP, 'Value, $k', Shares and '%' columns, sorted by value in
+            descending order. Empty if the report has no holdings.
+        """
+        if self.holdings_table is None or self.holdings_table.empty:
+            return pd.DataFrame(columns=['Name', 'Symbol', 'CUSIP', 'Value, $k', 'Shares', '%'])
+
+        # Extract relevant columns from holdings
+        df_holdings = pd.DataFrame({
+            'Name': self.holdings_table['name_of_issuer'],
+            'Symbol': self.holdings_table['ticker'],
+            'CUSIP': self.holdings_table['cusip'],
+            'Value, $k': (self.holdings_table['value'] / 1000).astype('int64'),  # Convert value to thousands
+            'Shares': self.holdings_table['ssh_prnamt']
+        })
 
         # Calculate total value and add percentage column
         value_total = df_holdings['Value, $k'].sum()
         df_holdings['%'] = ((df_holdings['Value, $k'] / value_total) * 100).round(2)
 
-
         # Sort by Value in descending order
-        df_holdings = df_holdings.sort_values(by='Value, $k', ascending=False)
-
-        if output == "as_html":
-            df_holdings_style = df_holdings.style.format({
-                'Shares': '{:,}'.format,  # Format Shares with commas
-                'Value, $k': '{:,.0f}'.format,  # Format Value with commas and no decimal points
-                '%': '{:.2f}'.format  # Format Value with commas and no decimal points
-            })
-            df_holdings_html = df_holdings_style.to_html(index=False)
-            display_html(df_holdings_html, raw=True)
-        else:
-            display(df_holdings)
+        return df_holdings.sort_values(by='Value, $k', ascending=False)
+
+
+    def save(self, path):
+        """
+        Write the header and the holdings table of the quarter report to an Arrow IPC (Feather v2) file.
+
+        The forms are not saved, a loaded report has the consolidated holdings only.
+
+        Args:
+            path (str): The path of the file.
+
+        Raises:
+            ValueError: If the report has no header, i.e. no forms were found for the quarter.
+        """
+        if self.header is None:
+            raise ValueError(f"No report to save for {self.cik} in {self.quarter}")
+
+        snapshot.write_snapshot(path, {self.quarter: self.holdings_table}, {
+            'cik': self.cik,
+            'headers': {self.quarter: self.header.to_dict()},
+        })
+
+    @classmethod
+    def load(cls, path, quarter=None):
+        """
+        Load a quarter report from a file written by save() or QuarterlyReportsCollection.save().
+
+        The file is memory-mapped, its holdings are read on access without a private copy, see
+        snapshot.read_snapshot(). No API request is sent.
+
+        Args:
+            path (str): The path of the file.
+            quarter (str): The quarter to load from a collection snapshot. Default is None, the only or latest
+                quarter of the file.
+
+        Returns:
+            QuarterReport: The quarter report, with an empty list of forms.
+
+        Raises:
+            KeyError: If the quarter is not in the file.
+        """
+        holdings_tables, metadata = snapshot.read_snapshot(path)
+        if quarter is None:
+            quarter = metadata['quarters'][-1]
+
+        return cls._from_snapshot(quarter, metadata['cik'], metadata['headers'][quarter], holdings_tables[quarter])
+
+    @classmethod
+    def _from_snapshot(cls, quarter, cik, header_dict, holdings_table):
+        # Built without __init__(), which would look the forms up
+        quarter_report = cls.__new__(cls)
+        quarter_report.quarter = quarter
+        quarter_report.cik = cik
+        quarter_report.header = ReportHeader.from_dict(header_dict)
+        quarter_report.forms = []
+        quarter_report.holdings_table = holdings_table
+
+        return quarter_report
+
+
+def enable_prefetch(distance=1, max_pending=prefetch.PREFETCH_QUEUE_SIZE, max_reports=prefetch.PREFETCH_CACHE_SIZE,
+                    max_workers=prefetch.PREFETCH_WORKERS):
+    """
+    Enable the background prefetch of the forms of the quarters adjacent to every QuarterReport built on demand.
+
+    When QuarterReport(quarter, cik) is built, the headers and holdings of the forms of the same CIK in the
+    quarters before and after it are fetched on background threads, so that building one of them next does not
+    wait for the API. Quarters after the current one are not prefetched.
+
+    Args:
+        distance (int): The number of quarters prefetched on each side. Default is 1.
+        max_pending (int): The maximum number of quarters waiting to be fetched. Default is PREFETCH_QUEUE_SIZE.
+        max_reports (int): The maximum number of quarters whose forms are kept. Default is PREFETCH_CACHE_SIZE.
+        max_workers (int): The number of background threads. Default is PREFETCH_WORKERS.
+
+    Returns:
+        prefetch.Prefetcher: The prefetcher used by all subsequent QuarterReport objects.
+    """
+    global prefetcher, prefetch_distance
+    disable_prefetch()
+    prefetch_distance = distance
+    prefetcher = prefetch.Prefetcher(_get_forms_for_quarter, max_pending, max_reports, max_workers)
+    return prefetcher
+
+
+def disable_prefetch():
+    """
+    Disable the background prefetch of adjacent quarters and stop its threads.
+    """
+    global prefetcher
+    if prefetcher is not None:
+        prefetcher.close()
+    prefetcher = None
+
+
+def schedule_adjacent_quarters(cik, quarter):
+    """
+    Schedule the prefetch of the quarters adjacent to a quarter, nearest first and the previous quarter before
+    the next one. Does nothing if the prefetch is not enabled.
+
+    Args:
+        cik (str): The Central Index Key (CIK) of the filer.
+        quarter (str): The quarter in the format 'YYYY-Q<1-4>'.
+    """
+    if prefetcher is None:
+        return
+
+    today = date.today()
+    current_key = today.year * 4 + (today.month - 1) // 3
+    quarter_key = quarter_to_key(quarter)
+    for offset in range(1, prefetch_distance + 1):
+        for adjacent_key in [quarter_key - offset, quarter_key + offset]:
+            if adjacent_key <= current_key:
+                prefetcher.schedule((cik, key_to_quarter(adjacent_key)))
+
+
+def _get_forms_for_quarter(cik_quarter):
+    cik, quarter = cik_quarter
+    return get_forms_for_period(cik, quarter_to_period_of_report(quarter))
+
+
+def quarter_to_key(quarter):
+    """
+    Convert a quarter string to an integer key, consecutive quarters having consecutive keys.
+
+    Args:
+        quarter (str): The quarter string in the format 'YYYY-Q<1-4>'.
+
+    Returns:
+        int: year * 4 + quarter - 1, e.g. 8095 for '2023-Q4'.
+    """
+    year, qtr = quarter.split('-Q')
+    return int(year) * 4 + int(qtr) - 1
+
+
+def key_to_quarter(quarter_key):
+    """
+    Convert an integer key from quarter_to_key() back to a quarter string.
+
+    Args:
+        quarter_key (int): The quarter key.
+
+    Returns:
+        str: The quarter string in the format 'YYYY-Q<1-4>'.
+    """
+    return f"{quarter_key // 4}-Q{quarter_key % 4 + 1}"
+
+
+def _intern(value):
+    # The same CIKs, company names and form types repeat in the headers of every quarter
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _date_to_str(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _str_to_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
 
 
 def quarter_to_period_of_report(quarter):
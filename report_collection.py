@@ -1,19 +1,163 @@
-import pandas as pd
-import numpy as np
-from IPython.display import display_html
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError, as_completed
 from datetime import date
 from typing import List
+import changes
+import form
+import html_table
 import report
+import snapshot
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+
+LONG_TABLE_COLUMNS = ['cik', 'company_name', 'period_of_report', 'report_quarter'] + [
+    column for column in report.HOLDING_COLUMNS if column != 'cik'
+]
+
+# Formats of the quarter columns of get_reports_frame(by) in HTML
+REPORT_FORMATS = {'value': '${:,.0f}', 'shares': '{:,.0f}', 'fraction': '{:,.2f}'}
+
+
+class HoldingsMatrix:
+    """
+    A class to represent the holdings of a collection as dense CUSIP x quarter matrices.
+
+    Row i of the matrices is the CUSIP of row i of index, column j is quarters[j]. A CUSIP not held in a quarter
+    has 0 shares and 0 value. Views are computed from the matrices without touching the holdings again.
+
+    Attributes:
+        index (pandas.DataFrame): The cusip, name_of_issuer and ticker of each row, names and tickers are taken
+            from the latest quarter holding the CUSIP.
+        quarters (list): The quarters of the columns in the format 'YYYY-Q<1-4>', in ascending order.
+        shares (numpy.ndarray): The number of shares, an int64 matrix of shape (len(index), len(quarters)).
+        value (numpy.ndarray): The value in dollars, an int64 matrix of the same shape.
+
+    Methods:
+        __init__(reports):
+            Initializes the HoldingsMatrix object from a map of QuarterReport objects by quarter.
+
+        view(by):
+            Returns the 'shares', 'value' or 'fraction' matrix as a float matrix.
+    """
+
+    def __init__(self, reports):
+        self.quarters = sorted(reports.keys())
+        tables = [reports[quarter].holdings_table for quarter in self.quarters]
+        holdings_table = pd.concat(
+            [table[['cusip', 'name_of_issuer', 'ticker', 'ssh_prnamt', 'value']] for table in tables],
+            ignore_index=True
+        ) if tables else pd.DataFrame(columns=['cusip', 'name_of_issuer', 'ticker', 'ssh_prnamt', 'value'])
+        quarter_index = np.repeat(np.arange(len(tables)), [len(table) for table in tables])
+
+        # Rows in order of first appearance, the last occurrence of each CUSIP is from its latest quarter
+        row_index, cusips = pd.factorize(holdings_table['cusip'].astype(object))
+        last_rows = holdings_table.assign(row=row_index).drop_duplicates('row', keep='last').sort_values('row')
+        self.index = pd.DataFrame({
+            'cusip': np.asarray(cusips, dtype=object),
+            'name_of_issuer': last_rows['name_of_issuer'].astype(object).to_numpy(),
+            'ticker': last_rows['ticker'].astype(object).to_numpy(),
+        })
+
+        self.shares = np.zeros((len(cusips), len(self.quarters)), dtype='int64')
+        self.value = np.zeros((len(cusips), len(self.quarters)), dtype='int64')
+        np.add.at(self.shares, (row_index, quarter_index), holdings_table['ssh_prnamt'].to_numpy(dtype='int64'))
+        np.add.at(self.value, (row_index, quarter_index), holdings_table['value'].to_numpy(dtype='int64'))
+
+    def view(self, by="value"):
+        """
+        Return one of the views of the holdings.
+
+        Args:
+            by (str): 'shares' for the number of shares, 'value' for the value in thousands of dollars or
+                'fraction' for the percentage of the total value of each quarter. Default is 'value'.
+
+        Returns:
+            numpy.ndarray: A float matrix with the same shape as shares.
+
+        Raises:
+            ValueError: If the 'by' parameter is not one of 'shares', 'value', or 'fraction'.
+        """
+        if by == 'shares':
+            return self.shares.astype('float64')
+        if by == 'value':
+            return self.value / 1000
+        if by == 'fraction':
+            quarter_totals = self.value.sum(axis=0)
+            return np.round(self.value / np.where(quarter_totals == 0, 1, quarter_totals) * 100, 2)
+
+        raise ValueError("Invalid 'by' parameter. Use 'shares', 'value', or 'fraction'.")
 
 
 class QuarterlyReportsCollection:
-    def __init__(self, cik, from_year, to_year):
+    """
+    A class to represent the quarterly reports of a fund over a range of years.
+
+    By default the constructor returns once all quarters are retrieved. Given a timeout or a progress callback,
+    it retrieves one quarter per task and returns after timeout seconds with the quarters done by then, e.g. to
+    show a dashboard at a fixed latency. The other quarters are listed in missing_quarters and added by resume():
+    the at most max_workers quarters being retrieved at the timeout complete in the background, the others are
+    requested again by resume().
+
+    Attributes:
+        cik (str): The Central Index Key (CIK) of the fund.
+        from_year (int): The first year of the reports.
+        to_year (int): The last year of the reports.
+        quarters (list): The quarters of the range in the format 'YYYY-Q<1-4>', up to the current quarter.
+        reports (dict): A map with the quarter as key and its QuarterReport as value, for the quarters with forms.
+        accession_numbers (set): The accession numbers of the forms of the reports.
+        last_sync (datetime.date): The date the reports were retrieved or last refreshed.
+        missing_quarters (list): The quarters with forms whose report was not retrieved within the timeout or
+            failed, in ascending order.
+        failures (dict): A map with the quarter as key and the exception as value for the quarters which failed.
+
+    Methods:
+        __init__(cik, from_year, to_year, timeout, progress, max_workers):
+            Initializes the QuarterlyReportsCollection object and retrieves its reports. progress is called with
+            (quarters_done, quarters_total, rows_fetched) after every quarter. max_workers is the number of
+            quarters requested at the same time with a timeout or progress.
+
+        resume(timeout, progress, max_workers):
+            Retrieves the missing quarters. Returns the quarters added.
+
+        refresh():
+            Brings the collection up to date with the forms filed since it was built.
+
+        save(path):
+            Writes the reports to an Arrow IPC file.
+
+        load(path):
+            Class method memory-mapping a collection from a file written by save().
+    """
+
+    def __init__(self, cik, from_year, to_year, timeout=None, progress=None, max_workers=report.MAX_WORKERS):
+        self._init_state(cik, from_year, to_year)
+        self._generate_quarters()
+        if timeout is None and progress is None:
+            self._get_reports()
+        else:
+            self._get_reports_within(timeout, progress, max_workers)
+
+    def _init_state(self, cik, from_year, to_year):
+        """
+        Set the attributes of an empty collection, shared by __init__(), load() and the subclasses.
+        """
         self.cik = cik
         self.from_year = from_year
         self.to_year = to_year
+        self.quarters = []
         self.reports = {}
-        self._generate_quarters()
-        self._get_reports()
+        self.accession_numbers = set()
+        self.last_sync = None
+        self.missing_quarters = []
+        self.failures = {}
+        self._missing_headers = {}
+        self._pending = {}
+        self._headers_future = None
+        self._holdings_matrix = None
 
     def _generate_quarters(self):
         """
@@ -32,20 +176,344 @@ class QuarterlyReportsCollection:
 
     def _get_reports(self):
         """
-        Call QuarterReport() for each quarter and populate the reports map with key as quarter and value as report.
+        Retrieve the forms of all quarters with a single range query, call QuarterReport() for each quarter
+        and populate the reports map with key as quarter and value as report.
+        """
+        self.last_sync = date.today()
+        if not self.quarters:
+            return
+
+        from_date = report.quarter_to_period_of_report(self.quarters[0])
+        to_date = report.quarter_to_period_of_report(self.quarters[-1])
+        with report.api_stats.stage('get_forms'):
+            forms_by_period = report.get_forms_for_range(self.cik, from_date, to_date)
+        self._add_reports(forms_by_period)
+
+    def _get_reports_within(self, timeout, progress, max_workers):
+        """
+        List the headers of all quarters with a single range query in the background, then retrieve the quarters
+        with resume() in what is left of timeout. Until the headers are listed, all quarters are missing.
         """
+        self.last_sync = date.today()
+        if not self.quarters:
+            return
+
+        self.missing_quarters = list(self.quarters)
+        self._missing_headers = None
+        self.resume(timeout, progress, max_workers)
+
+    def _list_headers(self):
+        from_date = report.quarter_to_period_of_report(self.quarters[0])
+        to_date = report.quarter_to_period_of_report(self.quarters[-1])
+        with report.api_stats.stage('get_forms'):
+            return report.get_form_headers(self.cik, from_date, to_date)
+
+    def _set_missing_headers(self, headers):
+        # Only the quarters with forms can be missing
+        quarters_by_period = {report.quarter_to_period_of_report(quarter): quarter for quarter in self.quarters}
+        missing_headers = defaultdict(list)
+        for header in headers:
+            quarter = quarters_by_period.get(str(header.period_of_report))
+            if quarter is not None and quarter not in self.reports:
+                missing_headers[quarter].append(header)
+        self._missing_headers = dict(missing_headers)
+        self.missing_quarters = sorted(self._missing_headers)
+
+    def resume(self, timeout=None, progress=None, max_workers=report.MAX_WORKERS):
+        """
+        Retrieve the quarters listed in missing_quarters, e.g. after building the collection with a timeout.
+
+        The headers of the range are listed first if the build timed out or failed before listing them. A quarter
+        still being retrieved by a previous call is waited for instead of being requested again, one which failed
+        is requested again. Quarters not done within timeout stay in missing_quarters, the quarters which failed
+        are also recorded in failures.
+
+        Args:
+            timeout (float): The number of seconds to wait for the quarters, or None to wait for all of them. With
+                0, only the quarters retrieved in the background since the last call are added.
+            progress (callable): Called with (quarters_done, quarters_total, rows_fetched) after every quarter
+                retrieved or failed. Default is None.
+            max_workers (int): The maximum number of quarters requested at the same time. The forms and pages of
+                a quarter are requested one at a time.
+
+        Returns:
+            list: The quarters added to the collection, in ascending order.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self._missing_headers is None:
+            # The listing runs in the background too, so that it is bounded by the deadline
+            future = self._headers_future
+            if future is None or (future.done() and future.exception() is not None):
+                executor = ThreadPoolExecutor(max_workers=1)
+                future = self._headers_future = executor.submit(self._list_headers)
+                executor.shutdown(wait=False)
+            try:
+                headers = future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                return []
+            except Exception as error:
+                self.failures.update({quarter: error for quarter in self.missing_quarters})
+                return []
+            self._headers_future = None
+            self.failures = {}
+            self._set_missing_headers(headers)
+
+        quarters = list(self.missing_quarters)
+        if not quarters:
+            return []
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {}
+        for quarter in quarters:
+            future = self._pending.get(quarter)
+            if future is None or future.cancelled() or (future.done() and future.exception() is not None):
+                # One form and one page at a time, the pool already runs max_workers quarters
+                future = executor.submit(report.get_forms_for_headers, self._missing_headers[quarter], 1)
+            futures[future] = quarter
+
+        added_quarters = []
+        quarters_done = 0
+        rows_fetched = 0
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            for future in as_completed(futures, timeout=remaining):
+                quarter = futures[future]
+                try:
+                    forms = future.result()
+                except Exception as error:
+                    self.failures[quarter] = error
+                else:
+                    self.failures.pop(quarter, None)
+                    added_quarters.extend(self._add_reports({report.quarter_to_period_of_report(quarter): forms}))
+                    if quarter in self.reports:
+                        rows_fetched += len(self.reports[quarter].holdings_table)
+                quarters_done += 1
+                if progress is not None:
+                    progress(quarters_done, len(quarters), rows_fetched)
+        except TimeoutError:
+            pass
+        finally:
+            # Quarters not started are cancelled, the running ones complete in the background for the next call
+            for future in futures:
+                future.cancel()
+            self._pending = {
+                quarter: future for future, quarter in futures.items()
+                if quarter in self.missing_quarters and not future.cancelled()
+            }
+            executor.shutdown(wait=False)
+
+        return sorted(added_quarters)
+
+    def refresh(self):
+        """
+        Bring the collection up to date with the forms filed since it was built or last refreshed.
+
+        The headers of the whole range are listed again with one paginated query, bypassing the cached header
+        lists. Only the forms whose accession numbers are not part of the collection yet are fetched, and only
+        the quarters they belong to are consolidated again, together with the forms those quarters already had.
+        Quarters which started since the last sync are added to the collection.
+
+        Returns:
+            list: The quarters which were added or consolidated again, in ascending order.
+        """
+        self._generate_quarters()
+        self.last_sync = date.today()
+        if not self.quarters:
+            return []
+
+        from_date = report.quarter_to_period_of_report(self.quarters[0])
+        to_date = report.quarter_to_period_of_report(self.quarters[-1])
+        headers = report.get_form_headers(self.cik, from_date, to_date, cached=False)
+
+        new_headers = [header for header in headers if header.accession_number not in self.accession_numbers]
+        if not new_headers:
+            return []
+
+        new_forms_by_period = report.group_forms_by_period(report.get_forms_for_headers(new_headers))
+
+        # Merge the new forms of each touched quarter with the forms it already had
+        forms_by_period = {}
+        for quarter in self.quarters:
+            period_of_report = report.quarter_to_period_of_report(quarter)
+            if period_of_report in new_forms_by_period:
+                previous_forms = self.reports[quarter].forms if quarter in self.reports else []
+                if quarter in self.reports and not previous_forms:
+                    # Loaded from a snapshot, which has the consolidated holdings but not the forms: the forms it
+                    # had are taken from the uncached header list, a cached one may not have the new forms yet
+                    previous_forms = report.get_forms_for_headers([
+                        header for header in headers
+                        if str(header.period_of_report) == period_of_report
+                        and header.accession_number in self.accession_numbers
+                    ])
+                forms_by_period[period_of_report] = sorted(
+                    previous_forms + new_forms_by_period[period_of_report],
+                    key=lambda form: form.header.filed_as_of_date
+                )
+
+        return self._add_reports(forms_by_period)
+
+    def _add_reports(self, forms_by_period):
+        """
+        Call QuarterReport() for each quarter with its forms from the map of forms by period of report and
+        populate the reports map with key as quarter and value as report. Returns the quarters added or replaced.
+        """
+        added_quarters = []
         for quarter in self.quarters:
-            quarter_report = report.QuarterReport(quarter, self.cik)
+            forms = forms_by_period.get(report.quarter_to_period_of_report(quarter), [])
+            quarter_report = report.QuarterReport(quarter, self.cik, forms=forms)
             if quarter_report.header is not None:
                 self.reports[quarter] = quarter_report
+                self.accession_numbers.update(quarter_report.header.accession_numbers)
+                added_quarters.append(quarter)
+                if quarter in self.missing_quarters:
+                    self.missing_quarters.remove(quarter)
+                if self._missing_headers:
+                    self._missing_headers.pop(quarter, None)
+
+        if added_quarters:
+            self._holdings_matrix = None
+
+        return added_quarters
+
+    def holdings_matrix(self):
+        """
+        Return the CUSIP x quarter matrices of the reports, built on first use and kept until the reports change.
 
-    def display_reports(self, by="value", output="native"):
+        Returns:
+            HoldingsMatrix: The shares and value of every CUSIP in every quarter of the collection.
         """
-        This method converts the reports into an array sorted by quarter ascending and populates data for display.
+        if self._holdings_matrix is None:
+            self._holdings_matrix = HoldingsMatrix(self.reports)
+
+        return self._holdings_matrix
+
+    def save(self, path):
+        """
+        Write the headers and the holdings tables of all reports to one Arrow IPC (Feather v2) file.
+
+        Loading the file with load() rebuilds the collection without any API request, e.g. in another kernel or
+        in worker processes. The forms are not saved, see QuarterReport.save().
+
+        Args:
+            path (str): The path of the file.
+        """
+        snapshot.write_snapshot(
+            path,
+            {quarter: quarter_report.holdings_table for quarter, quarter_report in self.reports.items()},
+            {
+                'cik': self.cik,
+                'from_year': self.from_year,
+                'to_year': self.to_year,
+                'collection_quarters': self.quarters,
+                'last_sync': self.last_sync,
+                'headers': {quarter: self.reports[quarter].header.to_dict() for quarter in self.reports},
+            }
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a collection from a file written by save().
+
+        The file is memory-mapped: the holdings tables are views of the mapped pages, read on access and shared
+        by all the processes loading the same file, see snapshot.read_snapshot(). Call refresh() to bring the
+        loaded collection up to date.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            QuarterlyReportsCollection: The collection as saved.
+        """
+        holdings_tables, metadata = snapshot.read_snapshot(path)
+
+        # Built without __init__(), which would retrieve the reports
+        collection = cls.__new__(cls)
+        collection._init_state(metadata['cik'], metadata['from_year'], metadata['to_year'])
+        collection.quarters = metadata['collection_quarters']
+        collection.last_sync = date.fromisoformat(metadata['last_sync']) if metadata['last_sync'] else None
+        collection.reports = {
+            quarter: report.QuarterReport._from_snapshot(quarter, collection.cik, metadata['headers'][quarter],
+                                                         holdings_tables[quarter])
+            for quarter in metadata['quarters']
+        }
+        collection.accession_numbers = {
+            accession_number
+            for quarter_report in collection.reports.values()
+            for accession_number in quarter_report.header.accession_numbers
+        }
+
+        return collection
+
+    def get_holdings_table(self):
+        """
+        Return the holdings of all reports as one long-format table sorted by quarter.
+
+        Returns:
+            pandas.DataFrame: The holdings tables of the reports with the company_name, period_of_report and
+            report_quarter columns added, one row per (cik, report_quarter, cusip).
+        """
+        tables = [
+            self.reports[quarter].holdings_table.assign(
+                company_name=self.reports[quarter].header.company_name,
+                period_of_report=str(self.reports[quarter].header.period_of_report),
+                report_quarter=quarter
+            )
+            for quarter in sorted(self.reports.keys())
+        ]
+        if not tables:
+            return pd.DataFrame(columns=LONG_TABLE_COLUMNS)
+
+        return pd.concat(tables, ignore_index=True)[LONG_TABLE_COLUMNS]
+
+    def position_changes(self):
+        """
+        Return the quarter over quarter position changes between every pair of adjacent reports.
+
+        See changes.position_changes().
+
+        Returns:
+            pandas.DataFrame: One row per CUSIP and pair of adjacent quarters where it is held in either quarter,
+            with the change type and the share and value deltas.
+        """
+        return changes.position_changes(self.get_holdings_table(), quarters=sorted(self.reports.keys()))
+
+    def iter_collection_rows(self):
+        """
+        Yield the holdings of all reports one row at a time, sorted by quarter.
+
+        Unlike get_holdings_table(), no table of the whole collection is built, so exports can stream the rows
+        in constant memory.
+
+        Yields:
+            dict: A holding with the LONG_TABLE_COLUMNS keys.
+        """
+        for quarter in sorted(self.reports.keys()):
+            header = self.reports[quarter].header
+            report_columns = {
+                'company_name': header.company_name,
+                'period_of_report': str(header.period_of_report),
+                'report_quarter': quarter,
+            }
+            holdings_table = self.reports[quarter].holdings_table
+
+            for values in holdings_table[report.HOLDING_COLUMNS].itertuples(index=False, name=None):
+                row = dict(zip(report.HOLDING_COLUMNS, values), **report_columns)
+                yield {column: row[column] for column in LONG_TABLE_COLUMNS}
+
+    def display_reports(self, by="value", output="native", page=0, page_size=html_table.PAGE_SIZE):
+        """
+        This method displays the holdings of the reports with one row per CUSIP and one column per quarter ascending.
+
+        The view is sliced out of the matrices of holdings_matrix(), which are built once and shared by all views.
+        Use get_reports_frame() to get the same table without rendering it.
 
         Args:
             by (str): Determines whether to display by 'shares', 'value', or 'fraction'. Default is 'value'.
+                'fraction' is the percentage of the total value of each quarter.
             output (str): Determines whether to display as 'as_html' or 'native'. Default is 'native'.
+            page (int): The page of CUSIPs displayed as HTML, starting at 0. Default is 0.
+            page_size (int): The number of CUSIPs per HTML page. Default is html_table.PAGE_SIZE.
 
         Raises:
             ValueError: If the 'by' parameter is not one of 'shares', 'value', or 'fraction'.
@@ -64,73 +532,94 @@ class QuarterlyReportsCollection:
         if output not in ["as_html", "native"]:
             raise ValueError("Invalid 'output' parameter. Use 'as_html' or 'native'.")
 
-        # List to hold all report data
-        data = []
-
-        # Sort reports by quarter in ascending order
-        sorted_reports = [self.reports[quarter] for quarter in sorted(self.reports.keys())]
-
-        # Loop through each QuarterReport to collect data
-        for report in sorted_reports:
-            for holding in report.holdings:
-                header = report.header
-                data.append({
-                    'cik': header.cik,
-                    'company_name': header.company_name,
-                    'period_of_report': header.period_of_report,
-                    'report_quarter': header.report_quarter,
-                    'name_of_issuer': holding.name_of_issuer,
-                    'title_of_class': holding.title_of_class,
-                    'cusip': holding.cusip,
-                    'ticker': holding.ticker,
-                    'value': holding.value,
-                    'ssh_prnamt': holding.ssh_prnamt,
-                    'ssh_prnamt_type': holding.ssh_prnamt_type,
-                })
-
-        # Create a DataFrame from the data
-        df = pd.DataFrame(data)
-
-        # Calculate total value and add percentage column
-        df['value'] = df['value']/1000
-        value_total = df['value'].sum()
-        df['%'] = ((df['value'] / value_total) * 100).round(2)
-
-        # Determine the column to pivot by
-        pivot_column = 'value' if by == 'value' else 'ssh_prnamt' if by == 'shares' else '%'
-
-        # Pivot the DataFrame to get the desired structure
-        pivot_df = df.pivot_table(
-            index=['name_of_issuer', 'ticker'],
-            columns='report_quarter',
-            values=pivot_column,
-            aggfunc='first'  # Use 'first' in case there are duplicate entries
-        )
+        pivot_start = time.perf_counter()
+        pivot_df = self.get_reports_frame(by)
+        title = self._reports_title(by)
+        report.api_stats.record_stage('pivot', time.perf_counter() - pivot_start)
 
-        # Sort the columns so that report_quarters are in chronological order
-        pivot_df = pivot_df.sort_index(axis=1)
+        # IPython is only imported when rendering
+        from IPython.display import display, display_html
 
-        # Replace NaN with 0
-        pivot_df = pivot_df.fillna(0).reset_index()
+        with report.api_stats.stage('render'):
+            if output == "as_html":
+                display_html(self.get_reports_html(by, page, page_size, pivot_df, title), raw=True)
+            else:
+                if by == 'fraction':
+                    pd.options.display.float_format = '{:.2f}'.format
+                elif by == 'value':
+                    pd.options.display.float_format = '{:.0f}'.format
+                else:
+                    pd.options.display.float_format = '{:.0f}'.format
+                display(pivot_df)
+            pd.reset_option('display.float_format')
 
-        # Set display format based on the 'by' parameter
-        # Rename columns
-        pivot_df.rename(columns={'name_of_issuer': 'Name', 'ticker': 'Symbol'}, inplace=True)
+    def get_reports_frame(self, by="value"):
+        """
+        Return the holdings of the reports as displayed by display_reports(), without rendering them.
+
+        Args:
+            by (str): Determines whether to return 'shares', 'value', or 'fraction'. Default is 'value'.
 
-        # Ensure 'Name' and 'Symbol' are the leftmost columns
-        quarter_columns = [col for col in pivot_df.columns if col not in ['Name', 'Symbol']]
-        overall_columns = ['Name', 'Symbol'] + quarter_columns
-        pivot_df = pivot_df[overall_columns]
+        Returns:
+            pandas.DataFrame: The Name and Symbol columns followed by one column per quarter ascending, one row per
+            CUSIP sorted by the first quarter in descending order.
 
-        first_quarter = quarter_columns[0]
-        pivot_df = pivot_df.sort_values(by=first_quarter, ascending=False)
+        Raises:
+            ValueError: If the 'by' parameter is not one of 'shares', 'value', or 'fraction'.
+        """
+        if by not in ["shares", "value", "fraction"]:
+            raise ValueError("Invalid 'by' parameter. Use 'shares', 'value', or 'fraction'.")
 
-        # Remove the name attribute from the columns
-        pivot_df.columns.name = None
+        # Slice the requested view out of the cached matrices
+        matrix = self.holdings_matrix()
+        quarter_values = matrix.view(by)
+        if not matrix.quarters:
+            return pd.DataFrame(columns=['Name', 'Symbol'])
 
-        # Remove the index name from the DataFrame
-        pivot_df.index.name = None
+        # Rows sorted by the first quarter in descending order
+        order = np.argsort(-quarter_values[:, 0], kind='stable')
+        pivot_df = pd.DataFrame(quarter_values[order], columns=matrix.quarters)
+        pivot_df.insert(0, 'Name', matrix.index['name_of_issuer'].to_numpy()[order])
+        pivot_df.insert(1, 'Symbol', matrix.index['ticker'].to_numpy()[order])
 
+        return pivot_df
+
+    def get_reports_html(self, by="value", page=0, page_size=html_table.PAGE_SIZE, pivot_df=None, title=None):
+        """
+        Return one page of the reports as the HTML table displayed by display_reports(), without rendering it.
+
+        Only the rows of the page are formatted, the other CUSIPs are summed up in an Other row, see
+        html_table.frame_to_html_page().
+
+        Args:
+            by (str): Determines whether to return 'shares', 'value', or 'fraction'. Default is 'value'.
+            page (int): The page of CUSIPs, starting at 0. Default is 0, the largest positions of the first quarter.
+            page_size (int): The number of CUSIPs per page. Default is html_table.PAGE_SIZE.
+            pivot_df (pandas.DataFrame): The frame returned by get_reports_frame(by), if already built.
+            title (str): The title of the table. Default is the title of display_reports().
+
+        Returns:
+            str: The HTML of the title and of the table of the page with the Other and Total rows.
+
+        Raises:
+            ValueError: If the 'by' parameter is not one of 'shares', 'value', or 'fraction'.
+            ValueError: If page is out of range.
+        """
+        if pivot_df is None:
+            pivot_df = self.get_reports_frame(by)
+        if title is None and self.reports:
+            title = self._reports_title(by)
+
+        quarters = [column for column in pivot_df.columns if column not in ['Name', 'Symbol']]
+        formats = {quarter: REPORT_FORMATS[by] for quarter in quarters}
+        # The percentages are rounded, the total of a quarter with holdings is 100
+        totals = None
+        if by == 'fraction':
+            totals = {quarter: 100.0 if pivot_df[quarter].any() else 0.0 for quarter in quarters}
+
+        return html_table.frame_to_html_page(pivot_df, formats, page, page_size, title=title, totals=totals)
+
+    def _reports_title(self, by):
         # Get the latest quarter's report
         latest_quarter = sorted(self.reports.keys())[-1]
         latest_report = self.reports[latest_quarter]
@@ -146,20 +635,103 @@ class QuarterlyReportsCollection:
         else:
             title = f"Percentage Over Quarters Held by {company_name_upper}"
 
-        if output == "as_html":
-            if by == 'fraction':
-                pd.options.display.float_format = '{:,.2f}'.format
-            elif by == 'value':
-                pd.options.display.float_format = '${:,.0f}'.format
-            else:
-                pd.options.display.float_format = '{:,.0f}'.format
-            display_html(f"<h3>{title}</h3>" + pivot_df.to_html(index=False), raw=True)
+        return title
+
+
+class MultiFundReportsCollection:
+    """
+    A class to represent the quarterly reports of several funds over the same range of years.
+
+    Each fund is built as a QuarterlyReportsCollection on a thread or process pool, so fetching and consolidating
+    the holdings of different funds run in parallel. A fund that fails is recorded in failures and does not
+    abort the others.
+
+    Attributes:
+        ciks (list): The Central Index Keys (CIKs) of the funds, e.g. from get_ciks_by_name().
+        from_year (int): The first year of the reports.
+        to_year (int): The last year of the reports.
+        holdings_table (pandas.DataFrame): The holdings of all funds in long format, one row per
+            (cik, report_quarter, cusip), sorted by cik and report_quarter.
+        failures (dict): A map with the CIK of each fund which could not be built as key and the exception as value.
+
+    Methods:
+        __init__(ciks, from_year, to_year, max_workers, executor):
+            Initializes the MultiFundReportsCollection object and builds the funds with max_workers workers of
+            the 'thread' or 'process' executor. Process workers are spawned, so a script using them must guard
+            its entry point with if __name__ == '__main__'.
+    """
+
+    def __init__(self, ciks, from_year, to_year, max_workers=4, executor="thread"):
+        if executor not in ["thread", "process"]:
+            raise ValueError("Invalid 'executor' parameter. Use 'thread' or 'process'.")
+
+        self.ciks = list(ciks)
+        self.from_year = from_year
+        self.to_year = to_year
+        self.holdings_table = None
+        self.failures = {}
+        self._get_funds(max_workers, executor)
+
+    def _get_funds(self, max_workers, executor):
+        """
+        Build the holdings table of every fund on the pool and concatenate them.
+        """
+        if executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=max_workers)
         else:
-            if by == 'fraction':
-                pd.options.display.float_format = '{:.2f}'.format
-            elif by == 'value':
-                pd.options.display.float_format = '{:.0f}'.format
-            else:
-                pd.options.display.float_format = '{:.0f}'.format
-            display(pivot_df)
-        pd.reset_option('display.float_format')
+            # Spawned rather than forked, so that the workers do not inherit the cache connection and locks held by
+            # other threads, then configured like this process. Each worker has its own token bucket, the rate is
+            # split between them.
+            settings = form.get_settings()
+            if settings['rate']:
+                settings['rate'] /= max_workers
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=form.apply_settings, initargs=(settings,))
+        tables = {}
+
+        with pool:
+            futures = {
+                pool.submit(get_fund_holdings_table, cik, self.from_year, self.to_year): cik for cik in self.ciks
+            }
+            for future in as_completed(futures):
+                cik = futures[future]
+                try:
+                    tables[cik] = future.result()
+                except Exception as error:
+                    self.failures[cik] = error
+
+        # Concatenate in the order of the CIKs so that the result does not depend on completion order
+        ordered_tables = [tables[cik] for cik in self.ciks if cik in tables]
+        if ordered_tables:
+            self.holdings_table = pd.concat(ordered_tables, ignore_index=True)
+        else:
+            self.holdings_table = pd.DataFrame(columns=LONG_TABLE_COLUMNS)
+
+    def position_changes(self):
+        """
+        Return the quarter over quarter position changes of all funds, keyed on (cik, cusip).
+
+        See changes.position_changes().
+
+        Returns:
+            pandas.DataFrame: One row per fund, CUSIP and pair of adjacent quarters where it is held in either
+            quarter, with the change type and the share and value deltas.
+        """
+        return changes.position_changes(self.holdings_table)
+
+
+def get_fund_holdings_table(cik, from_year, to_year):
+    """
+    Build the QuarterlyReportsCollection of a fund and return its long-format holdings table.
+
+    This is a module level function so that it can run on a process pool.
+
+    Args:
+        cik (str): The Central Index Key (CIK) of the fund.
+        from_year (int): The first year of the reports.
+        to_year (int): The last year of the reports.
+
+    Returns:
+        pandas.DataFrame: The holdings table as returned by QuarterlyReportsCollection.get_holdings_table().
+    """
+    return QuarterlyReportsCollection(cik, from_year, to_year).get_holdings_table()
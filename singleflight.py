@@ -0,0 +1,60 @@
+import threading
+
+
+class SingleFlight:
+    """
+    A class to represent a group of calls where concurrent calls with the same key share one execution.
+
+    The first caller of a key runs the function, callers arriving with the same key while it runs wait for it
+    and receive the same result or exception. Once the call completes the key is forgotten, later calls run the
+    function again.
+
+    Attributes:
+        coalesced (int): The number of calls which waited for the call of another thread instead of running.
+
+    Methods:
+        __init__():
+            Initializes the SingleFlight object.
+
+        do(key, function, *args, **kwargs):
+            Runs function(*args, **kwargs), or waits for the running call with the same key. Returns its result.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
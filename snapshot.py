@@ -0,0 +1,85 @@
+import json
+import os
+
+import form
+from lazy import LazyModule
+
+pa = LazyModule('pyarrow')
+pd = LazyModule('pandas')
+
+SNAPSHOT_VERSION = 1
+METADATA_KEY = b'forms13f'
+
+
+def write_snapshot(path, holdings_tables, metadata):
+    """
+    Write the holdings tables of several quarters to one Arrow IPC (Feather v2) file.
+
+    The tables are stored one after the other in ascending quarter order, with the row offset of each quarter and
+    the metadata in the schema metadata. The descriptive columns are dictionary encoded once for the whole file.
+    The file is written to a temporary file first, so that a failure never leaves a truncated snapshot.
+
+    Args:
+        path (str): The path of the snapshot file.
+        holdings_tables (dict): A map with the quarter as key and its holdings table as value.
+        metadata (dict): JSON serializable metadata stored with the tables, e.g. the report headers. Dates are
+            stored as ISO strings.
+    """
+    quarters = sorted(holdings_tables.keys())
+    tables = [holdings_tables[quarter][form.HOLDING_COLUMNS] for quarter in quarters]
+    if tables:
+        frame = pd.concat(
+            [table.astype({column: object for column in form.CATEGORY_COLUMNS}) for table in tables],
+            ignore_index=True
+        )
+    else:
+        frame = form.holdings_to_table([])
+    frame = frame.assign(**{column: form._to_category(frame[column]) for column in form.CATEGORY_COLUMNS})
+
+    offsets = [0]
+    for table in tables:
+        offsets.append(offsets[-1] + len(table))
+
+    snapshot_metadata = dict(metadata, version=SNAPSHOT_VERSION, quarters=quarters, offsets=offsets)
+    # A single record batch, so that every column of the mapped file is one contiguous buffer
+    table = pa.Table.from_pandas(frame, preserve_index=False).combine_chunks()
+    table = table.replace_schema_metadata({METADATA_KEY: json.dumps(snapshot_metadata, default=str)})
+
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + '.tmp', path)
+
+
+def read_snapshot(path):
+    """
+    Memory-map a snapshot written by write_snapshot() and return its holdings tables and metadata.
+
+    The columns are not read into memory: the numeric columns and, with Arrow-backed pandas strings, the cusip
+    column of the returned tables are views of the mapped file, so their pages are loaded on access and shared by
+    all the processes mapping the same file. Only the small dictionary codes and categories of the descriptive
+    columns are converted. The tables of the quarters are row slices of one table.
+
+    Args:
+        path (str): The path of the snapshot file.
+
+    Returns:
+        tuple: A map with the quarter as key and its holdings table as value, and the metadata of the snapshot.
+
+    Raises:
+        ValueError: If the file is not a snapshot of a supported version.
+    """
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    metadata = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b'null'))
+    if not isinstance(metadata, dict) or metadata.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is not a snapshot of version {SNAPSHOT_VERSION}")
+
+    # One block per column, so that numeric columns are not consolidated into a copy
+    frame = table.to_pandas(split_blocks=True)
+    offsets = metadata['offsets']
+    holdings_tables = {
+        quarter: frame.iloc[offsets[position]:offsets[position + 1]].reset_index(drop=True)
+        for position, quarter in enumerate(metadata['quarters'])
+    }
+
+    return holdings_tables, metadata
@@ -0,0 +1,336 @@
+"""
+A local stand-in for the Forms13F.com API, serving synthetic filers.
+
+It implements the /api/v1/forms, /api/v1/form, /api/v1/funds, /api/v1/filings, /api/v1/filers and /api/v1/filer
+endpoints with the same query parameters and JSON fields as the API, adds a configurable latency to every
+response and can answer a fraction of the requests with 429 to exercise the client backoff.
+
+Usage:
+    python stub_server.py --port 8000 --latency 0.05 --rate-429 0.01 --filer 0000000001:20000
+
+or from Python:
+
+    with StubServer(filers={'0000000001': 20000}, latency=0.05) as server:
+        form.configure(host=server.url)
+        ...
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_FILERS = {
+    '0000000100': 100,
+    '0000001000': 1000,
+    '0000010000': 10000,
+    '0000050000': 50000,
+}
+QUARTER_END_DATES = ['03-31', '06-30', '09-30', '12-31']
+DUPLICATE_FRACTION = 0.1  # Fraction of the rows of a form repeating the CUSIP of another row
+
+
+class SyntheticFiler:
+    """
+    A class to represent a synthetic filer and its forms.
+
+    Every quarter of the range has a 13F-HR form with holdings_count rows, the second quarter of every year also
+    has a 'NEW HOLDINGS' amendment. Rows are generated deterministically from the accession number.
+
+    Attributes:
+        cik (str): Central Index Key (CIK) of the filer.
+        holdings_count (int): Number of rows of each 13F-HR form.
+        headers (list): The form headers of the filer as JSON objects, latest period of report first.
+
+    Methods:
+        __init__(cik, holdings_count, from_year, to_year):
+            Initializes the SyntheticFiler object and generates its form headers.
+
+        holdings(accession_number):
+            Returns the rows of a form as JSON objects.
+    """
+
+    def __init__(self, cik, holdings_count, from_year, to_year):
+        self.cik = cik
+        self.holdings_count = holdings_count
+        self.headers = []
+        self._holdings = {}
+        self._lock = threading.Lock()
+
+        for year in range(from_year, to_year + 1):
+            for quarter, end_date in enumerate(QUARTER_END_DATES, start=1):
+                period_of_report = date.fromisoformat(f"{year}-{end_date}")
+                filed_as_of_date = period_of_report + timedelta(days=45)
+                accession_number = f"{cik}-{year % 100:02d}-{quarter:06d}"
+                self.headers.append(self._header(accession_number, period_of_report, filed_as_of_date,
+                                                 holdings_count, None, None))
+                if quarter == 2:
+                    self.headers.append(self._header(accession_number[:-1] + '9', period_of_report,
+                                                     filed_as_of_date + timedelta(days=30),
+                                                     max(1, holdings_count // 100), 'Y', 'NEW HOLDINGS'))
+
+        self.headers.sort(key=lambda header: header['period_of_report'], reverse=True)
+
+    def _header(self, accession_number, period_of_report, filed_as_of_date, entry_total, is_amendment,
+                amendment_type):
+        return {
+            'url': f"https://www.sec.gov/Archives/edgar/data/{int(self.cik)}/{accession_number}.txt",
+            'accession_number': accession_number,
+            'submission_type': '13F-HR/A' if is_amendment else '13F-HR',
+            'public_document_count': 2,
+            'period_of_report': str(period_of_report),
+            'filed_as_of_date': str(filed_as_of_date),
+            'date_as_of_change': str(filed_as_of_date),
+            'effectiveness_date': str(filed_as_of_date),
+            'cik': self.cik,
+            'company_name': f"SYNTHETIC FUND {self.cik}",
+            'irs_number': None,
+            'state_of_incorporation': 'DE',
+            'fiscal_year_end': '1231',
+            'form_type': '13F-HR/A' if is_amendment else '13F-HR',
+            'sec_act': '1934 Act',
+            'sec_file_number': None,
+            'film_number': None,
+            'business_address': None,
+            'business_phone': None,
+            'table_value_total': entry_total * 1000000,
+            'table_entry_total': entry_total,
+            'is_amendment': is_amendment,
+            'amendment_type': amendment_type,
+            'conf_denied_expired': None,
+            'conf_date_denied_expired': None,
+            'amendment_date_reported': None,
+        }
+
+    def holdings(self, accession_number):
+        with self._lock:
+            if accession_number not in self._holdings:
+                header = next((header for header in self.headers
+                               if header['accession_number'] == accession_number), None)
+                self._holdings[accession_number] = [] if header is None else self._generate_holdings(header)
+            return self._holdings[accession_number]
+
+    def _generate_holdings(self, header):
+        rnd = random.Random(header['accession_number'])
+        entry_total = header['table_entry_total']
+        distinct_count = max(1, int(entry_total * (1 - DUPLICATE_FRACTION)))
+        rows = []
+
+        for _ in range(entry_total):
+            # Most CUSIPs are shared across quarters and funds, so that quarter over quarter views overlap
+            security = rnd.randrange(distinct_count)
+            shares = rnd.randrange(1, 1000000)
+            rows.append({
+                'accession_number': header['accession_number'],
+                'cik': self.cik,
+                'name_of_issuer': f"ISSUER {security:06d}",
+                'title_of_class': 'COM',
+                'cusip': f"{security:09d}",
+                'ticker': f"T{security}" if security % 10 else None,
+                'value': shares * rnd.randrange(1, 500),
+                'ssh_prnamt': shares,
+                'ssh_prnamt_type': 'SH',
+                'investment_discretion': 'SOLE',
+                'voting_authority_sole': shares,
+                'voting_authority_shared': 0,
+                'voting_authority_none': 0,
+            })
+
+        return rows
+
+
+class StubServer:
+    """
+    A class to represent a local Forms13F.com API stand-in running on a background thread.
+
+    Attributes:
+        url (str): The base URL of the server, to be passed to form.configure(host=...).
+        latency (float): Seconds added to every response.
+        rate_429 (float): Fraction of the requests answered with 429 Too Many Requests.
+        filers (dict): A map with the CIK as key and the SyntheticFiler as value.
+        request_counts (collections.Counter): Number of requests received per endpoint path.
+        throttled_counts (collections.Counter): Number of 429 responses per endpoint path.
+
+    Methods:
+        __init__(filers, latency, rate_429, from_year, to_year, host, port, seed):
+            Initializes the StubServer object, filers maps CIKs to the number of holdings of their forms.
+
+        start():
+            Starts serving on a background thread.
+
+        stop():
+            Stops the server.
+
+        reset_counts():
+            Resets the request counters.
+    """
+
+    def __init__(self, filers=None, latency=0.0, rate_429=0.0, from_year=2020, to_year=2024, host='127.0.0.1',
+                 port=0, seed=0):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.filers = {
+            cik: SyntheticFiler(cik, holdings_count, from_year, to_year)
+            for cik, holdings_count in (filers or DEFAULT_FILERS).items()
+        }
+        self.request_counts = Counter()
+        self.throttled_counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.request_counts.clear()
+            self.throttled_counts.clear()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+        return Handler
+
+    def _handle(self, handler):
+        url = urlparse(handler.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        with self._lock:
+            self.request_counts[url.path] += 1
+            throttled = self._random.random() < self.rate_429
+            if throttled:
+                self.throttled_counts[url.path] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if throttled:
+            self._send(handler, 429, {'error': 'Too Many Requests'})
+            return
+
+        routes = {
+            '/api/v1/forms': self._forms,
+            '/api/v1/form': self._form,
+            '/api/v1/funds': self._funds,
+            '/api/v1/filings': self._filings,
+            '/api/v1/filers': self._filers,
+            '/api/v1/filer': self._filer,
+        }
+        if url.path not in routes:
+            self._send(handler, 404, {'error': 'Not Found'})
+            return
+
+        try:
+            body = routes[url.path](query)
+        except KeyError as error:
+            self._send(handler, 400, {'error': f"Missing parameter {error}"})
+            return
+        self._send(handler, 200, body)
+
+    def _send(self, handler, status, body):
+        data = json.dumps(body).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    @staticmethod
+    def _page(rows, query):
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', 100))
+        return rows[offset:offset + limit]
+
+    def _forms(self, query):
+        filer = self.filers.get(query['cik'])
+        from_date = query.get('from', '2010-01-01')
+        to_date = query.get('to', '2030-01-01')
+        headers = [] if filer is None else [
+            header for header in filer.headers if from_date <= header['period_of_report'] <= to_date
+        ]
+        return self._page(headers, query)
+
+    def _form(self, query):
+        filer = self.filers.get(query['cik'])
+        holdings = [] if filer is None else filer.holdings(query['accession_number'])
+        return self._page(holdings, query)
+
+    def _funds(self, query):
+        name = query.get('name', '').lower()
+        funds = [
+            {'name': filer.headers[0]['company_name'], 'cik': cik}
+            for cik, filer in sorted(self.filers.items()) if name in filer.headers[0]['company_name'].lower()
+        ]
+        return self._page(funds, query)
+
+    def _filings(self, query):
+        headers = sorted(
+            (header for filer in self.filers.values() for header in filer.headers
+             if query['from'] <= header['filed_as_of_date'] <= query['to']),
+            key=lambda header: (header['filed_as_of_date'], header['accession_number']),
+            reverse=True
+        )
+        return self._page(headers, query)
+
+    def _filers(self, query):
+        filers = [
+            {'cik': cik, 'company_names': [filer.headers[0]['company_name']]}
+            for cik, filer in sorted(self.filers.items())
+        ]
+        return self._page(filers, query)
+
+    def _filer(self, query):
+        filer = self.filers.get(query['cik'])
+        return {'cik': query['cik'], 'company_names': [] if filer is None else [filer.headers[0]['company_name']]}
+
+
+def parse_filer(value):
+    cik, _, holdings_count = value.partition(':')
+    return cik, int(holdings_count or 1000)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve synthetic filers with the Forms13F.com API endpoints.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--filer', type=parse_filer, action='append',
+                        help="CIK:HOLDINGS of a synthetic filer, can be repeated")
+    args = parser.parse_args()
+
+    stub_server = StubServer(filers=dict(args.filer) if args.filer else None, latency=args.latency,
+                             rate_429=args.rate_429, host=args.host, port=args.port)
+    print(f"Serving {len(stub_server.filers)} synthetic filers on {stub_server.url}")
+    stub_server.start()
+    try:
+        stub_server._thread.join()
+    except KeyboardInterrupt:
+        stub_server.stop()